@@ -0,0 +1,24 @@
+import asyncio
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_AGENT_CONCURRENCY = int(os.getenv("AGENT_CONCURRENCY", "8"))
+
+
+def concurrency_limit(name: str, max_concurrency: int = None) -> int:
+    """Max in-flight calls for an agent.
+
+    An explicit ``max_concurrency`` wins, then ``<NAME>_CONCURRENCY`` from the
+    environment (e.g. ``JOB_AGENT_CONCURRENCY``), then ``AGENT_CONCURRENCY``.
+    """
+    if max_concurrency:
+        return max_concurrency
+    env_value = os.getenv(f"{name.upper()}_CONCURRENCY")
+    return int(env_value) if env_value else DEFAULT_AGENT_CONCURRENCY
+
+
+def make_limiter(name: str, max_concurrency: int = None) -> asyncio.Semaphore:
+    """Semaphore bounding the concurrent async calls of one agent."""
+    return asyncio.Semaphore(concurrency_limit(name, max_concurrency))
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import time
+
+
+class LazyAgent:
+    """Builds an agent on first use and remembers how that went.
+
+    ``state`` is one of ``pending``, ``loading``, ``ready`` or ``failed``. A
+    failed build is retried on the next request instead of taking the whole
+    server down.
+    """
+
+    def __init__(self, name: str, factory):
+        self.name = name
+        self.factory = factory
+        self.state = "pending"
+        self.error = None
+        self.load_seconds = None
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def instance(self):
+        """The built agent, or None if it has not been built yet."""
+        return self._instance
+
+    def get(self):
+        if self._instance is not None:
+            return self._instance
+
+        with self._lock:
+            if self._instance is not None:
+                return self._instance
+
+            self.state = "loading"
+            started = time.perf_counter()
+            try:
+                instance = self.factory()
+            except Exception as e:
+                self.state = "failed"
+                self.error = f"{type(e).__name__}: {e}"
+                print(f"❌ Failed to initialize {self.name}: {self.error}")
+                raise
+
+            self._instance = instance
+            self.load_seconds = round(time.perf_counter() - started, 3)
+            self.state = "ready"
+            self.error = None
+            return instance
+
+    async def aget(self):
+        if self._instance is not None:
+            return self._instance
+        # Construction embeds documents and reads files; keep it off the event loop
+        return await asyncio.to_thread(self.get)
+
+    def status(self) -> dict:
+        return {"state": self.state, "error": self.error, "load_seconds": self.load_seconds}
+
+
+class AgentRegistry:
+    def __init__(self):
+        self.agents = {}
+
+    def register(self, name: str, factory) -> LazyAgent:
+        self.agents[name] = factory if isinstance(factory, LazyAgent) else LazyAgent(name, factory)
+        return self.agents[name]
+
+    def __getitem__(self, name: str) -> LazyAgent:
+        return self.agents[name]
+
+    async def aget(self, name: str):
+        return await self.agents[name].aget()
+
+    async def warmup(self):
+        """Build every agent concurrently; failures are recorded, not raised."""
+        await asyncio.gather(
+            *(agent.aget() for agent in self.agents.values()), return_exceptions=True
+        )
+
+    @property
+    def ready(self) -> bool:
+        return all(agent.state == "ready" for agent in self.agents.values())
+
+    def status(self) -> dict:
+        return {name: agent.status() for name, agent in self.agents.items()}
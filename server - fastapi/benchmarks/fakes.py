@@ -0,0 +1,283 @@
+"""Deterministic local stand-ins for Gemini chat and embeddings.
+
+Replies are built from the prompt the agent actually sent (the retrieved
+context, the candidates, the questions), so retrieval, prompt formatting and
+reply parsing all run exactly as they do against the real model.
+"""
+
+from typing import Any, Iterator, AsyncIterator, List, Optional
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class LatencyModel:
+    """``base`` seconds plus up to ``jitter`` seconds, reproducible per seed."""
+
+    def __init__(self, base: float = 0.0, jitter: float = 0.0, seed: int = 0):
+        self.base = base
+        self.jitter = jitter
+        self._random = random.Random(seed)
+
+    def sample(self) -> float:
+        if self.jitter <= 0:
+            return self.base
+        return self.base + self._random.uniform(0, self.jitter)
+
+
+def _json_objects(text: str) -> list[dict]:
+    """Every JSON object embedded line-by-line in a prompt (retrieved documents)."""
+    found = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("{") and line.endswith("}"):
+            try:
+                found.append(json.loads(line))
+            except ValueError:
+                pass
+    return found
+
+
+def _after(text: str, marker: str) -> str:
+    return text.split(marker, 1)[1] if marker in text else ""
+
+
+def _mcqs(skills: str) -> list[dict]:
+    return [
+        {
+            "question": f"Q{i + 1}: which statement about {skills} is true?",
+            "options": ["A) first", "B) second", "C) third", "D) fourth"],
+            "correct_option": "ABCD"[i % 4],
+        }
+        for i in range(10)
+    ]
+
+
+def fake_reply(system: str, human: str) -> str:
+    """The reply a well-behaved model would give to this prompt."""
+    if "multiple choice questions" in system:
+        return json.dumps(_mcqs(_after(human, "User skills:").strip()))
+
+    if "descriptive/coding questions" in system:
+        skills = _after(human, "User skills:").strip()
+        return json.dumps(
+            [{"question": f"Task {i + 1} using {skills}"} for i in range(3)]
+        )
+
+    if "coding evaluator" in system:
+        answer = _after(human, "User Answer:").strip()
+        score = min(10, 3 + len(answer) // 10)
+        return json.dumps({"score": score, "feedback": "Reasonable."})
+
+    if "answered incorrectly" in system:
+        try:
+            wrong = json.loads(_after(human, "Incorrect answers:"))
+        except ValueError:
+            wrong = []
+        return json.dumps(
+            [
+                {
+                    "index": w.get("index"),
+                    "feedback": "The correct option follows from the definition.",
+                }
+                for w in wrong
+                if isinstance(w, dict)
+            ]
+        )
+
+    if "already ranked" in system:
+        try:
+            candidates = json.loads(_after(human, "Candidates:"))
+        except ValueError:
+            candidates = []
+        return json.dumps(
+            {
+                c["email"]: "Strong skill overlap with the job."
+                for c in candidates
+                if "email" in c
+            }
+        )
+
+    if "career advisor" in system:
+        jobs = [
+            {
+                "title": job.get("title", ""),
+                "company": job.get("client", ""),
+                "rate": str(job.get("budget", "")),
+                "skills_required": job.get("skillsRequired", []),
+                "description": job.get("description", ""),
+                "link": "",
+            }
+            for job in _json_objects(human)[:4]
+        ]
+        return "```json\n" + json.dumps(jobs, indent=2) + "\n```"
+
+    if "AI recruiter" in system:
+        users = [
+            {
+                "fullname": user.get("fullname", ""),
+                "email": user.get("email", ""),
+                "headline": user.get("headline", ""),
+                "skills": user.get("skills", []),
+                "hourlyRate": user.get("hourlyRate", 0),
+                "stars": user.get("stars", 0),
+                "portfolioLinks": user.get("portfolioLinks", {}),
+            }
+            for user in _json_objects(human)[:4]
+        ]
+        return json.dumps(users)
+
+    if "running summary" in system:
+        messages = _after(human, "New messages:").strip().splitlines()
+        return "The user asked about: " + "; ".join(
+            m[:60] for m in messages if m.startswith("User:")
+        )
+
+    if "market analyst" in system:
+        return "Aim for the middle of the suggested range and adjust for experience."
+
+    if "cover letters" in system:
+        return (
+            "Dear Hiring Manager,\n\n"
+            + " ".join(["I am a strong fit for this role."] * 40)
+            + "\n\nSincerely,\nCandidate"
+        )
+
+    # Chatbot (RAG / fallback): a medium-sized answer that streams in many chunks
+    question = re.sub(r"\s+", " ", human)[:80]
+    return f"Here is what I found about '{question}'. " + " ".join(
+        ["SkillVerse makes this simple."] * 30
+    )
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model answering from :func:`fake_reply` after a simulated delay.
+
+    ``latency`` applies to the whole reply (or to the first chunk when
+    streaming); ``token_latency`` is paid per streamed chunk.
+    """
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    token_latency: float = 0.0
+    chunk_words: int = 4
+    calls: int = 0
+
+    _latency_model: Any = None
+
+    def model_post_init(self, __context: Any) -> None:
+        self._latency_model = LatencyModel(self.latency, self.jitter)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-benchmark-chat"
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        self.calls += 1
+        system = "\n".join(str(m.content) for m in messages if m.type == "system")
+        human = str(messages[-1].content) if messages else ""
+        return fake_reply(system, human)
+
+    def _chunks(self, text: str) -> list[str]:
+        words = text.split(" ")
+        return [
+            " ".join(words[i : i + self.chunk_words])
+            + (" " if i + self.chunk_words < len(words) else "")
+            for i in range(0, len(words), self.chunk_words)
+        ]
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self._latency_model.sample())
+        message = AIMessage(content=self._reply(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self._latency_model.sample())
+        message = AIMessage(content=self._reply(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self._latency_model.sample())
+        for text in self._chunks(self._reply(messages)):
+            time.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._latency_model.sample())
+        for text in self._chunks(self._reply(messages)):
+            await asyncio.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+
+
+class FakeEmbeddings(Embeddings):
+    """Bag-of-words hashing embeddings, so similar texts get similar vectors.
+
+    Good enough for retrieval to return plausible documents; each upstream
+    call sleeps ``latency`` seconds like a network round trip would.
+    """
+
+    def __init__(self, size: int = 768, latency: float = 0.0):
+        self.size = size
+        self.latency = latency
+        self.calls = 0
+
+    def _vector(self, text: str) -> list[float]:
+        vec = np.zeros(self.size, dtype=np.float32)
+        for token in re.findall(r"[a-z0-9+#.]+", text.lower()):
+            h = int.from_bytes(
+                hashlib.md5(token.encode("utf-8")).digest()[:4], "little"
+            )
+            vec[h % self.size] += 1.0 if h & 1 << 31 else -1.0
+        norm = np.linalg.norm(vec)
+        if norm:
+            vec /= norm
+        else:
+            vec[0] = 1.0
+        return vec.tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return self._vector(text)
@@ -0,0 +1,634 @@
+"""Offline load test: every endpoint, concurrent clients, no network.
+
+The Gemini chat model and embeddings are replaced by the stand-ins in
+``fakes.py`` before ``main`` is imported, so what is measured is the service's
+own overhead (retrieval, prompt formatting, parsing, the event loop) plus the
+simulated model latency.
+
+    python benchmarks/load_test.py --concurrency 32 --requests 300 --llm-latency 0.3
+    python benchmarks/load_test.py --endpoints chat,recommend --json run.json
+    python benchmarks/load_test.py --baseline run.json --max-regression 0.2
+
+Response caches are disabled unless ``--cache`` is given, and the MCQ pool
+only kicks in with ``--mcq-pool``, so repeated queries keep exercising the
+full path. The LLM gateway's rate limit is off unless ``--llm-rpm`` is set.
+"""
+
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVICE_DIR))
+
+from fakes import FakeChatModel, FakeEmbeddings, _mcqs  # noqa: E402
+from dataset_loader import load_records, job_id  # noqa: E402
+
+# ---------- Request payloads ----------
+CHAT_MESSAGES = [
+    "hi",
+    "How is my money protected?",
+    "How does escrow protect my payment as a student?",
+    "What fees does the platform charge businesses for hiring?",
+    "How do I write a proposal that stands out to clients?",
+    "Can I withdraw my earnings to a bank account?",
+    "How are disputes between clients and freelancers resolved?",
+]
+JOB_QUERIES = [
+    "React frontend developer with UI/UX skills",
+    "Python Django backend and REST APIs",
+    "machine learning with TensorFlow and data analysis",
+    "mobile app developer for Flutter",
+    "content writer for a marketing blog",
+    "DevOps engineer with Docker and Kubernetes",
+]
+USER_QUERIES = [
+    "Need a React developer around $40/hr",
+    "Python and Django engineer for an API project",
+    "someone who can design a modern brand identity",
+    "looking for a person to build our online store",
+]
+RATE_QUERIES = [
+    "React developer",
+    "Python backend",
+    "data scientist",
+    "graphic designer",
+]
+SKILL_SETS = [
+    ["Python", "Django"],
+    ["React", "JavaScript"],
+    ["SQL"],
+    ["Node.js", "MongoDB"],
+]
+JOB_IDS = [job_id(job) for job in load_records(SERVICE_DIR / "jobs_dataset.json")]
+
+
+def pick(items, i):
+    return items[i % len(items)]
+
+
+def evaluate_mcqs_payload(i):
+    skills = ", ".join(pick(SKILL_SETS, i))
+    return {
+        "questions": _mcqs(skills),
+        "user_answers": {str(q): "ABCD"[(q + i) % 4] for q in range(10)},
+        "explain": i % 2 == 0,
+    }
+
+
+def evaluate_descriptive_payload(i):
+    questions = [
+        {"question": f"Task {q + 1} using {', '.join(pick(SKILL_SETS, i))}"}
+        for q in range(3)
+    ]
+    return {
+        "questions": questions,
+        "user_answers": {
+            str(q): "def solve(xs):\n    return sorted(xs)" for q in range(3)
+        },
+    }
+
+
+# name -> (method, path, payload(i) or None)
+SCENARIOS = {
+    "chat": (
+        "POST",
+        "/chat",
+        lambda i: {"message": pick(CHAT_MESSAGES, i), "history": []},
+    ),
+    "chat-stream": (
+        "POST",
+        "/chat/stream",
+        lambda i: {"message": pick(CHAT_MESSAGES, i)},
+    ),
+    "recommend": ("POST", "/recommend", lambda i: {"query": pick(JOB_QUERIES, i)}),
+    "recommend-filtered": (
+        "POST",
+        "/recommend",
+        lambda i: {
+            "query": pick(JOB_QUERIES, i),
+            "status": "open",
+            "budget_min": 100,
+            "budget_max": 150,
+            "page": 1 + i % 2,
+            "page_size": 4,
+        },
+    ),
+    "recommend-batch": (
+        "POST",
+        "/recommend/batch",
+        lambda i: {"queries": [pick(JOB_QUERIES, i + j) for j in range(8)]},
+    ),
+    "recommend-stream": (
+        "POST",
+        "/recommend/stream",
+        lambda i: {"query": pick(JOB_QUERIES, i)},
+    ),
+    "recommend-users": (
+        "POST",
+        "/recommend-users",
+        lambda i: {"query": pick(USER_QUERIES, i), "explain": i % 3 == 0},
+    ),
+    "recommend-users-batch": (
+        "POST",
+        "/recommend-users/batch",
+        lambda i: {"queries": [pick(USER_QUERIES, i + j) for j in range(8)]},
+    ),
+    "recommend-users-stream": (
+        "POST",
+        "/recommend-users/stream",
+        lambda i: {"query": pick(USER_QUERIES, i)},
+    ),
+    "benchmark": (
+        "POST",
+        "/benchmark",
+        lambda i: {"query": pick(RATE_QUERIES, i), "explain": i % 2 == 0},
+    ),
+    "generate-proposal": (
+        "POST",
+        "/generate-proposal",
+        lambda i: {
+            "job_title": pick(JOB_QUERIES, i),
+            "skills": pick(SKILL_SETS, i),
+            "name": "Sam Student",
+            "email": "sam@example.com",
+            "description": "Build and maintain features for a growing web app.",
+        },
+    ),
+    "generate-proposals": (
+        "POST",
+        "/generate-proposals",
+        lambda i: {
+            "name": "Sam Student",
+            "skills": pick(SKILL_SETS, i),
+            "job_ids": [pick(JOB_IDS, i + j) for j in range(5)],
+        },
+    ),
+    "generate-mcqs": (
+        "POST",
+        "/generate-mcqs",
+        lambda i: {"skills": pick(SKILL_SETS, i)},
+    ),
+    "evaluate-mcqs": ("POST", "/evaluate-mcqs", evaluate_mcqs_payload),
+    "generate-descriptive": (
+        "POST",
+        "/generate-descriptive",
+        lambda i: {"skills": pick(SKILL_SETS, i)},
+    ),
+    "evaluate-descriptive": (
+        "POST",
+        "/evaluate-descriptive",
+        evaluate_descriptive_payload,
+    ),
+    "evaluate-descriptive-stream": (
+        "POST",
+        "/evaluate-descriptive/stream",
+        evaluate_descriptive_payload,
+    ),
+    "job-candidates": ("GET", f"/jobs/{JOB_IDS[0]}/candidates", None),
+    "cache-stats": ("GET", "/cache/stats", None),
+    "metrics": ("GET", "/metrics", None),
+    "ready": ("GET", "/ready", None),
+}
+
+
+# ---------- App setup ----------
+def build_app(args):
+    """Import ``main`` with every model call routed to the local stand-ins."""
+    os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+    os.environ["AGENT_WARMUP"] = "0"
+    os.environ["DATASET_WATCH_INTERVAL"] = "0"
+    if not args.cache:
+        os.environ["RESPONSE_CACHE_SIZE"] = "0"
+    if not args.mcq_pool:
+        os.environ["MCQ_POOL_HOT_AFTER"] = str(10**9)
+    # The gateway's quota would otherwise cap every scenario at the same rate
+    os.environ["LLM_REQUESTS_PER_MINUTE"] = str(args.llm_rpm)
+    os.environ["VECTOR_BACKEND"] = args.vector_backend
+    os.environ["VECTOR_INDEX_DIR"] = tempfile.mkdtemp(prefix="bench-vectors-")
+
+    import embedding_store
+
+    # A throwaway cache file so runs never read or pollute the real one
+    cache_dir = tempfile.mkdtemp(prefix="bench-embeddings-")
+    embedding_store.set_embedding(
+        embedding_store.CachedEmbeddings(
+            FakeEmbeddings(latency=args.embed_latency),
+            model="fake-embedding",
+            cache_path=Path(cache_dir) / "cache.sqlite3",
+        )
+    )
+
+    def fake_llm():
+        return FakeChatModel(
+            latency=args.llm_latency,
+            jitter=args.llm_jitter,
+            token_latency=args.token_latency,
+        )
+
+    import chatbot
+
+    chatbot.use_llm(fake_llm())
+
+    import main
+
+    # Agent factories read main.llm when they run, so this reaches every agent
+    main.llm = fake_llm()
+    return main
+
+
+# ---------- Driving the ASGI app ----------
+async def asgi_request(app, method: str, path: str, payload=None):
+    """One request straight through the ASGI app.
+
+    Returns (status, body, seconds to first body byte, total seconds); going
+    around an HTTP client keeps streaming responses measurable chunk by chunk.
+    """
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("ascii"),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"benchmark"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("ascii")),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+
+    sent = False
+    disconnected = asyncio.Event()
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    started = time.perf_counter()
+    first_byte = None
+    status = 0
+    chunks = []
+
+    async def send(message):
+        nonlocal first_byte, status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            if message.get("body"):
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+                chunks.append(message["body"])
+
+    try:
+        await app(scope, receive, send)
+    finally:
+        disconnected.set()
+
+    total = time.perf_counter() - started
+    return (
+        status,
+        b"".join(chunks),
+        first_byte if first_byte is not None else total,
+        total,
+    )
+
+
+def is_error(status: int, body: bytes) -> bool:
+    if status >= 400:
+        return True
+    try:
+        parsed = json.loads(body)
+    except ValueError:
+        # Streams are not JSON; they report failures as an "error" event
+        return b"event: error" in body
+    return isinstance(parsed, dict) and "error" in parsed
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a sleeping task.
+
+    Blocking work on the loop (sync embedding, CPU-heavy parsing) shows up
+    here long before it shows up as a latency regression under light load.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(time.perf_counter() - started - self.interval)
+
+    def __enter__(self):
+        self.lags = []
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+
+def rss_mb() -> float:
+    """Current resident set size (falls back to the peak where /proc is missing)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def percentiles_ms(values) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    arr = np.asarray(values) * 1000
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 2),
+        "p95": round(float(p95), 2),
+        "p99": round(float(p99), 2),
+        "max": round(float(arr.max()), 2),
+    }
+
+
+async def run_scenario(app, name: str, requests, concurrency: int, trace_memory: bool):
+    """Send ``requests`` [(method, path, payload)] from ``concurrency`` clients."""
+    queue = asyncio.Queue()
+    for request in requests:
+        queue.put_nowait(request)
+
+    latencies, first_bytes, errors = [], [], 0
+
+    async def client():
+        nonlocal errors
+        while True:
+            try:
+                method, path, payload = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                status, body, ttfb, total = await asgi_request(
+                    app, method, path, payload
+                )
+            except Exception as e:
+                print(f"❌ {name}: {type(e).__name__}: {e}")
+                errors += 1
+                continue
+            latencies.append(total)
+            first_bytes.append(ttfb)
+            errors += is_error(status, body)
+
+    if trace_memory:
+        tracemalloc.start()
+    rss_before = rss_mb()
+
+    with LoopLagMonitor() as lag:
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    result = {
+        "scenario": name,
+        "requests": len(requests),
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(requests) / elapsed, 2) if elapsed else None,
+        "latency_ms": percentiles_ms(latencies),
+        "first_byte_ms": percentiles_ms(first_bytes),
+        "loop_lag_ms": percentiles_ms(lag.lags),
+        "rss_mb": round(rss_mb(), 1),
+        "rss_delta_mb": round(rss_mb() - rss_before, 1),
+    }
+    if trace_memory:
+        result["py_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        tracemalloc.stop()
+    return result
+
+
+def build_requests(names, count: int):
+    """``count`` requests, round-robin over ``names`` so endpoints contend."""
+    requests = []
+    for i in range(count):
+        method, path, payload = SCENARIOS[names[i % len(names)]]
+        requests.append((method, path, payload(i) if payload else None))
+    return requests
+
+
+# ---------- Reporting ----------
+def print_table(results):
+    header = (
+        f"{'scenario':<24}{'req':>6}{'err':>5}{'rps':>9}{'p50':>9}{'p95':>9}"
+        f"{'p99':>9}{'ttfb95':>9}{'lag99':>8}{'rss MB':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        lat, ttfb, lag = r["latency_ms"], r["first_byte_ms"], r["loop_lag_ms"]
+        print(
+            f"{r['scenario']:<24}{r['requests']:>6}{r['errors']:>5}"
+            f"{r['throughput_rps'] or 0:>9.1f}{lat['p50'] or 0:>9.1f}"
+            f"{lat['p95'] or 0:>9.1f}{lat['p99'] or 0:>9.1f}{ttfb['p95'] or 0:>9.1f}"
+            f"{lag['p99'] or 0:>8.1f}{r['rss_mb']:>8.1f}"
+        )
+    print("(latencies in ms)")
+
+
+COMPARABLE_SETTINGS = (
+    "concurrency",
+    "requests",
+    "llm_latency",
+    "llm_jitter",
+    "token_latency",
+    "embed_latency",
+    "cache",
+    "mcq_pool",
+    "llm_rpm",
+    "vector_backend",
+)
+
+
+def compare(
+    results, config: dict, baseline_path: str, max_regression: float
+) -> list[str]:
+    """Scenarios whose p95 latency or throughput got worse than allowed."""
+    report = json.loads(Path(baseline_path).read_text())
+    differing = [
+        k for k in COMPARABLE_SETTINGS if report["config"].get(k) != config.get(k)
+    ]
+    if differing:
+        print(f"⚠️ Baseline was run with different settings: {', '.join(differing)}")
+
+    baseline = {r["scenario"]: r for r in report["results"]}
+    regressions = []
+    for r in results:
+        old = baseline.get(r["scenario"])
+        if not old:
+            continue
+        old_p95, new_p95 = old["latency_ms"]["p95"], r["latency_ms"]["p95"]
+        if old_p95 and new_p95 and new_p95 > old_p95 * (1 + max_regression):
+            regressions.append(f"{r['scenario']}: p95 {old_p95}ms -> {new_p95}ms")
+        old_rps, new_rps = old["throughput_rps"], r["throughput_rps"]
+        if old_rps and new_rps and new_rps < old_rps * (1 - max_regression):
+            regressions.append(
+                f"{r['scenario']}: throughput {old_rps} -> {new_rps} req/s"
+            )
+        if r["errors"] > old["errors"]:
+            regressions.append(
+                f"{r['scenario']}: errors {old['errors']} -> {r['errors']}"
+            )
+    return regressions
+
+
+# ---------- Entry point ----------
+async def run(args):
+    main = build_app(args)
+    app = main.app
+
+    names = args.endpoints.split(",") if args.endpoints else list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        raise SystemExit(
+            f"Unknown endpoints: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})"
+        )
+
+    rss_start = rss_mb()
+    started = time.perf_counter()
+    await main.agents.warmup()
+    startup = {
+        "seconds": round(time.perf_counter() - started, 3),
+        "rss_mb": round(rss_mb() - rss_start, 1),
+        "agents": main.agents.status(),
+    }
+    print(f"Agents built in {startup['seconds']}s (+{startup['rss_mb']} MB)")
+    for agent, status in startup["agents"].items():
+        if status["state"] != "ready":
+            print(f"  ❌ {agent}: {status['error']}")
+
+    # One unmeasured pass per endpoint fills the embedding cache and code paths
+    for name in names:
+        await run_scenario(
+            app, name, build_requests([name], min(args.concurrency, 8)), 4, False
+        )
+
+    results = []
+    for name in names:
+        requests = build_requests([name], args.requests)
+        results.append(
+            await run_scenario(app, name, requests, args.concurrency, args.tracemalloc)
+        )
+    if len(names) > 1:
+        requests = build_requests(names, args.requests * 2)
+        results.append(
+            await run_scenario(
+                app, "mixed", requests, args.concurrency, args.tracemalloc
+            )
+        )
+
+    print_table(results)
+    report = {
+        "config": {
+            k: v for k, v in vars(args).items() if k not in ("json", "baseline")
+        },
+        "startup": startup,
+        "results": results,
+    }
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+        print(f"Wrote {args.json}")
+
+    if args.baseline:
+        regressions = compare(
+            results, report["config"], args.baseline, args.max_regression
+        )
+        for line in regressions:
+            print(f"❌ Regression {line}")
+        if regressions:
+            return 1
+        print("✅ No regressions against baseline")
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--endpoints", help="comma-separated scenarios (default: all)")
+    parser.add_argument(
+        "--concurrency", type=int, default=16, help="concurrent clients"
+    )
+    parser.add_argument(
+        "--requests", type=int, default=100, help="requests per scenario"
+    )
+    parser.add_argument(
+        "--llm-latency", type=float, default=0.2, help="seconds per LLM call"
+    )
+    parser.add_argument(
+        "--llm-jitter", type=float, default=0.05, help="extra random LLM seconds"
+    )
+    parser.add_argument(
+        "--token-latency", type=float, default=0.005, help="seconds per streamed chunk"
+    )
+    parser.add_argument(
+        "--embed-latency", type=float, default=0.02, help="seconds per embedding call"
+    )
+    parser.add_argument(
+        "--llm-rpm",
+        type=float,
+        default=0,
+        help="LLM gateway requests per minute (default: unlimited)",
+    )
+    parser.add_argument(
+        "--vector-backend",
+        choices=["chroma", "mmap", "numpy"],
+        default="chroma",
+        help="vector store behind every document index",
+    )
+    parser.add_argument(
+        "--cache", action="store_true", help="keep the response caches enabled"
+    )
+    parser.add_argument(
+        "--mcq-pool", action="store_true", help="let the MCQ pool pre-generate sets"
+    )
+    parser.add_argument(
+        "--tracemalloc", action="store_true", help="report Python heap peaks (slower)"
+    )
+    parser.add_argument("--json", help="write the full report to this file")
+    parser.add_argument(
+        "--baseline", help="report from an earlier run to compare against"
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.2,
+        help="allowed p95/throughput change",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run(parse_args())))
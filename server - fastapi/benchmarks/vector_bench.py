@@ -0,0 +1,196 @@
+"""Compare the vector store backends on synthetic embeddings.
+
+Every backend indexes the same clustered unit vectors, in its own process
+so memory figures are not muddied by the others, and answers the same
+queries. Reported per backend: build time, resident memory added, search
+latency (``similarity_search_by_vector``, k results) and recall@k against
+exact float32 search.
+
+Usage (from ``server - fastapi``):
+
+    python benchmarks/vector_bench.py
+    python benchmarks/vector_bench.py --sizes 1000,20000,100000 --queries 500
+    python benchmarks/vector_bench.py --backends numpy-int8,numpy-int8-ivf --json v.json
+"""
+
+from pathlib import Path
+import argparse
+import gc
+import json
+import multiprocessing
+import sys
+import time
+import uuid
+
+import numpy as np
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVICE_DIR))
+
+from langchain_core.embeddings import Embeddings  # noqa: E402
+from load_test import percentiles_ms, rss_mb  # noqa: E402
+from vector_index import NumpyVectorStore, normalize_rows, top_k  # noqa: E402
+
+BACKENDS = {
+    "chroma": {},
+    "numpy-float32": {"dtype": "float32"},
+    "numpy-float16": {"dtype": "float16"},
+    "numpy-int8": {"dtype": "int8"},
+    # IVF regardless of size, to see what approximate search costs in recall
+    "numpy-int8-ivf": {"dtype": "int8", "ann_threshold": 1},
+}
+
+
+def corpus(n: int, dim: int, seed: int = 0):
+    """``n`` unit vectors around sqrt(n) topics, plus queries near some of them."""
+    rng = np.random.default_rng(seed)
+    topics = normalize_rows(rng.standard_normal((max(1, int(np.sqrt(n))), dim)))
+    vectors = topics[rng.integers(len(topics), size=n)]
+    vectors = normalize_rows(
+        vectors + 0.6 * rng.standard_normal((n, dim)) / np.sqrt(dim)
+    )
+    return vectors
+
+
+def queries_for(vectors: np.ndarray, count: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    picked = vectors[rng.integers(len(vectors), size=count)]
+    noise = 0.5 * rng.standard_normal(picked.shape) / np.sqrt(vectors.shape[1])
+    return normalize_rows(picked + noise)
+
+
+class LookupEmbeddings(Embeddings):
+    """Embeds ``"doc-<i>"`` as row i of a precomputed matrix."""
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    def embed_documents(self, texts):
+        return self.vectors[[int(t[4:]) for t in texts]].tolist()
+
+    def embed_query(self, text):
+        raise NotImplementedError("queries are passed as vectors")
+
+
+def build_store(backend: str, embedding, texts, ids):
+    if backend == "chroma":
+        from langchain_community.vectorstores import Chroma
+
+        store = Chroma(
+            collection_name=f"bench-{uuid.uuid4().hex[:8]}",
+            embedding_function=embedding,
+            collection_metadata={"hnsw:space": "cosine"},
+        )
+        # Chroma caps the size of one upsert
+        for start in range(0, len(texts), 5000):
+            store.add_texts(texts[start : start + 5000], ids=ids[start : start + 5000])
+        return store
+    return NumpyVectorStore.from_texts(texts, embedding, ids=ids, **BACKENDS[backend])
+
+
+def measure(backend: str, n: int, dim: int, query_count: int, k: int) -> dict:
+    vectors = corpus(n, dim)
+    queries = queries_for(vectors, query_count)
+    expected = [set(top_k(vectors @ q, k)) for q in queries]
+    texts = [f"doc-{i}" for i in range(n)]
+    embedding = LookupEmbeddings(vectors)
+
+    gc.collect()
+    before = rss_mb()
+    started = time.perf_counter()
+    store = build_store(backend, embedding, texts, texts)
+    build_seconds = time.perf_counter() - started
+    gc.collect()
+    memory = rss_mb() - before
+
+    timings, hits = [], 0
+    for query, truth in zip(queries, expected):
+        vector = query.tolist()
+        started = time.perf_counter()
+        docs = store.similarity_search_by_vector(vector, k=k)
+        timings.append(time.perf_counter() - started)
+        hits += len({int(d.page_content[4:]) for d in docs} & truth)
+
+    return {
+        "backend": backend,
+        "size": n,
+        "build_s": round(build_seconds, 3),
+        "rss_mb": round(memory, 1),
+        "vector_mb": (
+            round(store.nbytes / 2**20, 1) if hasattr(store, "nbytes") else None
+        ),
+        "search_ms": percentiles_ms(timings),
+        "recall": round(hits / (k * len(queries)), 4),
+    }
+
+
+def _run(args_tuple, results):
+    results.put(measure(*args_tuple))
+
+
+def measure_isolated(*args) -> dict:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_run, args=(args, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def print_table(rows):
+    header = (
+        f"{'backend':<16} {'size':>8} {'build s':>8} {'rss MB':>8} {'vec MB':>7} "
+        f"{'p50':>8} {'p95':>8} {'recall':>7}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        vec = "-" if r["vector_mb"] is None else r["vector_mb"]
+        print(
+            f"{r['backend']:<16} {r['size']:>8} {r['build_s']:>8} {r['rss_mb']:>8} "
+            f"{vec:>7} {r['search_ms']['p50']:>8} {r['search_ms']['p95']:>8} "
+            f"{r['recall']:>7}"
+        )
+    print("(search latencies in ms; recall@k against exact float32 search)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--backends",
+        default=",".join(BACKENDS),
+        help=f"comma-separated, from: {', '.join(BACKENDS)}",
+    )
+    parser.add_argument(
+        "--sizes", default="1000,10000", help="comma-separated corpus sizes"
+    )
+    parser.add_argument("--dim", type=int, default=768, help="embedding size")
+    parser.add_argument("--queries", type=int, default=200, help="queries per run")
+    parser.add_argument("--k", type=int, default=8, help="results per query")
+    parser.add_argument("--json", help="write the results to this file")
+    return parser.parse_args(argv)
+
+
+def main(args) -> int:
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    unknown = [b for b in backends if b not in BACKENDS]
+    if unknown:
+        print(f"Unknown backends: {', '.join(unknown)}")
+        return 2
+
+    rows = []
+    for size in [int(s) for s in args.sizes.split(",")]:
+        for backend in backends:
+            rows.append(measure_isolated(backend, size, args.dim, args.queries, args.k))
+    print_table(rows)
+    if args.json:
+        Path(args.json).write_text(json.dumps(rows, indent=2))
+        print(f"Wrote {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))
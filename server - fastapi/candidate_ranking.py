@@ -0,0 +1,101 @@
+from collections import defaultdict
+import re
+import numpy as np
+
+from text_utils import PhraseMatcher
+
+_RATE_PATTERN = re.compile(
+    r"\$\s*(\d+(?:\.\d+)?)|(\d+(?:\.\d+)?)\s*(?:\$|usd|dollars?)?\s*(?:/\s*h(?:ou)?r|per\s+hour|an\s+hour)",
+    re.IGNORECASE,
+)
+
+
+def parse_rate(text: str):
+    """First hourly rate mentioned in ``text`` ("$40/hr", "45 per hour"), or None."""
+    match = _RATE_PATTERN.search(text or "")
+    if not match:
+        return None
+    return float(match.group(1) or match.group(2))
+
+
+def candidate_card(user: dict) -> dict:
+    """The fields /recommend-users returns for a candidate."""
+    return {
+        "fullname": user.get("fullname", ""),
+        "email": user.get("email", ""),
+        "headline": user.get("headline", ""),
+        "skills": user.get("skills", []),
+        "hourlyRate": user.get("hourlyRate", 0),
+        "stars": user.get("stars", 0),
+        "portfolioLinks": user.get("portfolioLinks", {}),
+    }
+
+
+class CandidateRanker:
+    """Exact top-k candidate ranking over every user.
+
+    Order is lexicographic, as the recruiter prompt always asked for:
+    (1) number of required skills matched, (2) stars, (3) closeness of
+    ``hourlyRate`` to the target rate. Skills come from an inverted index,
+    and the numeric features are NumPy columns.
+    """
+
+    def __init__(self, users: list[dict]):
+        self.users = users
+        self.stars = np.array([float(u.get("stars") or 0) for u in users], dtype=np.float64)
+        self.rates = np.array(
+            [float(u.get("hourlyRate") or 0) for u in users], dtype=np.float64
+        )
+
+        postings = defaultdict(list)
+        for row, user in enumerate(users):
+            for skill in {s.lower() for s in user.get("skills") or []}:
+                postings[skill].append(row)
+        self.skill_index = {k: np.array(v, dtype=np.intp) for k, v in postings.items()}
+        self.phrases = PhraseMatcher(self.skill_index)
+
+    def __len__(self):
+        return len(self.users)
+
+    def extract_skills(self, text: str) -> list[str]:
+        """Known skills named in a free-text job description."""
+        return self.phrases.find(text)
+
+    def rank(self, skills: list[str], target_rate: float = None, k: int = 5):
+        """Return ``[(row, matched_skill_count)]`` for the best ``k`` users."""
+        matches = np.zeros(len(self.users), dtype=np.int64)
+        for skill in {s.lower() for s in skills}:
+            rows = self.skill_index.get(skill)
+            if rows is not None:
+                matches[rows] += 1
+
+        candidates = np.flatnonzero(matches)
+        if candidates.size == 0 or k <= 0:
+            return []
+
+        # Stars are within [0, 5], so match * 6 + stars orders exactly like
+        # (match, stars). Keep everything tied with the k-th key, then sort
+        # only those rows with the rate tie-breaker.
+        key = matches[candidates] * 6.0 + np.clip(self.stars[candidates], 0, 5)
+        if candidates.size > k:
+            kth = np.partition(key, candidates.size - k)[candidates.size - k]
+            candidates = candidates[key >= kth]
+
+        if target_rate is None:
+            rate_gap = np.zeros(candidates.size)
+        else:
+            rate_gap = np.abs(self.rates[candidates] - target_rate)
+        order = np.lexsort((rate_gap, -self.stars[candidates], -matches[candidates]))
+        top = candidates[order[:k]]
+        return [(int(row), int(matches[row])) for row in top]
+
+    def top_candidates(self, skills: list[str], target_rate: float = None, k: int = 5):
+        """Ranked candidate cards, each with the skills it matched."""
+        wanted = {s.lower() for s in skills}
+        results = []
+        for row, _ in self.rank(skills, target_rate, k):
+            user = self.users[row]
+            card = candidate_card(user)
+            card["matched_skills"] = [s for s in user.get("skills", []) if s.lower() in wanted]
+            results.append(card)
+        return results
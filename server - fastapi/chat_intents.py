@@ -0,0 +1,257 @@
+from pathlib import Path
+from typing import Optional
+import os
+import re
+from dotenv import load_dotenv
+
+from text_utils import tokenize
+
+load_dotenv()
+
+# Jaccard overlap of content words needed to answer straight from the FAQ
+FAQ_MATCH_THRESHOLD = float(os.getenv("FAQ_MATCH_THRESHOLD", "0.8"))
+
+# ---------- Small talk ----------
+SMALL_TALK_REPLIES = {
+    "greeting": (
+        "Hi there! I'm the SkillVerse assistant. Ask me anything about finding "
+        "projects, hiring students, payments or using the platform."
+    ),
+    "how_are_you": (
+        "I'm doing great, thanks for asking! How can I help you with SkillVerse today?"
+    ),
+    "help": (
+        "I can answer questions about SkillVerse: building your profile, finding "
+        "and applying to projects, hiring students, contracts and escrow payments, "
+        "fees, and the collaboration tools. What would you like to know?"
+    ),
+    "thanks": "You're welcome! Let me know if there's anything else I can help with.",
+    "goodbye": "Goodbye, and good luck with your projects on SkillVerse!",
+}
+
+SMALL_TALK_PHRASES = {
+    "greeting": [
+        "hi",
+        "hii",
+        "hello",
+        "hey",
+        "heya",
+        "hiya",
+        "yo",
+        "greetings",
+        "good morning",
+        "good afternoon",
+        "good evening",
+        "howdy",
+    ],
+    "how_are_you": [
+        "how are you",
+        "how are you doing",
+        "how is it going",
+        "how s it going",
+        "what s up",
+        "whats up",
+        "sup",
+    ],
+    "help": [
+        "help",
+        "help me",
+        "i need help",
+        "can you help",
+        "can you help me",
+        "what can you do",
+        "what do you do",
+        "who are you",
+    ],
+    "thanks": ["thanks", "thank you", "thx", "ty", "cheers"],
+    "goodbye": ["bye", "goodbye", "bye bye", "see you", "see ya", "good night"],
+}
+
+# Words that can pad small talk without changing what it means
+FILLER = {
+    "there",
+    "all",
+    "everyone",
+    "again",
+    "so",
+    "much",
+    "very",
+    "a",
+    "lot",
+    "please",
+    "bot",
+    "assistant",
+    "skillverse",
+    "team",
+    "friend",
+    "oh",
+    "ok",
+    "okay",
+    "and",
+}
+
+# When a message mixes intents ("hi, what can you do?"), answer the most useful
+INTENT_ORDER = ["help", "how_are_you", "thanks", "goodbye", "greeting"]
+
+_PHRASE_INTENT = {
+    tuple(phrase.split()): intent
+    for intent, phrases in SMALL_TALK_PHRASES.items()
+    for phrase in phrases
+}
+_LONGEST_PHRASE = max(len(p) for p in _PHRASE_INTENT)
+
+
+def match_small_talk(message: str) -> Optional[str]:
+    """The small-talk intent of ``message``, or None if it says anything else.
+
+    The whole message has to be greetings, thanks, "how are you" and the like
+    (plus filler words); "hi, how do I get paid?" is a real question.
+    """
+    tokens = [t for t in tokenize(message) if t not in FILLER]
+    if not tokens or len(tokens) > 8:
+        return None
+
+    intents = set()
+    i = 0
+    while i < len(tokens):
+        # Longest phrase starting here wins ("how are you doing" over "how are you")
+        for size in range(min(_LONGEST_PHRASE, len(tokens) - i), 0, -1):
+            intent = _PHRASE_INTENT.get(tuple(tokens[i : i + size]))
+            if intent:
+                intents.add(intent)
+                i += size
+                break
+        else:
+            return None
+    return next(intent for intent in INTENT_ORDER if intent in intents)
+
+
+# ---------- FAQ ----------
+STOPWORDS = {
+    "a",
+    "an",
+    "the",
+    "is",
+    "are",
+    "am",
+    "was",
+    "be",
+    "do",
+    "does",
+    "did",
+    "i",
+    "me",
+    "my",
+    "we",
+    "our",
+    "you",
+    "your",
+    "it",
+    "its",
+    "to",
+    "of",
+    "for",
+    "in",
+    "on",
+    "at",
+    "by",
+    "with",
+    "and",
+    "or",
+    "what",
+    "how",
+    "which",
+    "who",
+    "can",
+    "could",
+    "will",
+    "would",
+    "should",
+    "if",
+    "there",
+    "this",
+    "that",
+    "please",
+    "s",
+}
+
+_QUESTION = re.compile(r"^\*\*Q:\s*(.+?)\s*\*\*\s*$")
+_ANSWER = re.compile(r"^A:\s*(.*)$")
+
+
+def content_words(text: str) -> frozenset:
+    return frozenset(t for t in tokenize(text) if t not in STOPWORDS)
+
+
+def parse_faq(text: str) -> list[tuple[str, str]]:
+    """(question, answer) pairs from ``**Q: ...**`` / ``A: ...`` blocks.
+
+    An answer runs until the next question or heading.
+    """
+    pairs, question, answer = [], None, []
+
+    def flush():
+        if question and answer:
+            pairs.append((question, " ".join(answer).strip()))
+
+    for line in text.splitlines():
+        line = line.strip()
+        if q := _QUESTION.match(line):
+            flush()
+            question, answer = q.group(1), []
+        elif line.startswith("#"):
+            flush()
+            question, answer = None, []
+        elif question is not None and (answer or _ANSWER.match(line)):
+            if not answer:
+                line = _ANSWER.match(line).group(1)
+            if line:
+                answer.append(line)
+    flush()
+    return pairs
+
+
+class FaqIndex:
+    """Precomputed FAQ entries, matched by overlap of content words.
+
+    Only confident matches (``threshold``) are returned, so near misses still
+    go through retrieval and generation.
+    """
+
+    def __init__(self, pairs, source: str = "faq.txt", threshold=FAQ_MATCH_THRESHOLD):
+        self.source = source
+        self.threshold = threshold
+        self.entries = []
+        # word -> entry positions, so a query is only scored against FAQ
+        # questions it shares a word with
+        self.by_word = {}
+        for question, answer in pairs:
+            words = content_words(question)
+            if not words:
+                continue
+            for word in words:
+                self.by_word.setdefault(word, []).append(len(self.entries))
+            self.entries.append({"question": question, "answer": answer, "words": words})
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        path = Path(path)
+        return cls(parse_faq(path.read_text(encoding="utf-8")), source=path.name, **kwargs)
+
+    def match(self, question: str) -> Optional[dict]:
+        words = content_words(question)
+        if not words:
+            return None
+        best, best_score = None, 0.0
+        candidates = {i for word in words for i in self.by_word.get(word, ())}
+        for i in candidates:
+            entry = self.entries[i]
+            score = len(words & entry["words"]) / len(words | entry["words"])
+            if score > best_score:
+                best, best_score = entry, score
+        if best is None or best_score < self.threshold:
+            return None
+        return {"question": best["question"], "answer": best["answer"], "score": best_score}
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,203 @@
+from collections import OrderedDict
+import asyncio
+import os
+import time
+import uuid
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage, HumanMessage
+
+from text_utils import estimate_tokens
+
+load_dotenv()
+
+HISTORY_TOKENS = int(os.getenv("CHAT_HISTORY_TOKENS", "1500"))
+SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", "300"))
+SESSION_TTL = float(os.getenv("CHAT_SESSION_TTL", "3600"))
+MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "10000"))
+
+
+def message_tokens(message) -> int:
+    return estimate_tokens(str(message.content))
+
+
+def trim_history(messages: list, budget: int = HISTORY_TOKENS) -> list:
+    """The most recent ``messages`` that fit in ``budget`` tokens."""
+    kept, used = [], 0
+    for message in reversed(messages):
+        used += message_tokens(message)
+        if used > budget:
+            break
+        kept.append(message)
+    return kept[::-1]
+
+
+def _clip(text: str, tokens: int) -> str:
+    """Keep the end of ``text`` (the most recent part of a summary)."""
+    limit = tokens * 4
+    return text if len(text) <= limit else "…" + text[-limit:]
+
+
+class ChatSession:
+    """One conversation: a summary of older turns plus a window of recent ones.
+
+    Turns that fall out of the window wait in ``pending`` (and are still sent
+    to the model) until the summary has absorbed them, so nothing is lost
+    while a summary update is in flight.
+    """
+
+    def __init__(self, id: str):
+        self.id = id
+        self.summary = ""
+        self.pending = []
+        self.turns = []
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+        self.turn_count = 0
+        self._compacting = None
+
+    def history(self) -> list:
+        messages = []
+        if self.summary:
+            messages.append(
+                AIMessage(content=f"Summary of our conversation so far: {self.summary}")
+            )
+        return messages + self.pending + self.turns
+
+    def history_tokens(self) -> int:
+        return sum(message_tokens(m) for m in self.history())
+
+    def add_turn(self, question: str, reply: str):
+        self.turns += [HumanMessage(content=question), AIMessage(content=reply)]
+        self.turn_count += 1
+
+    def overflow(self, budget: int) -> bool:
+        window = budget - estimate_tokens(self.summary)
+        return sum(message_tokens(m) for m in self.turns) > window
+
+    def evict(self, budget: int):
+        """Move the oldest exchanges out of the window until it fits again."""
+        window = budget - estimate_tokens(self.summary)
+        # Always keep the latest exchange, however long it is
+        while (
+            len(self.turns) > 2 and sum(message_tokens(m) for m in self.turns) > window
+        ):
+            self.pending += self.turns[:2]
+            self.turns = self.turns[2:]
+
+    def status(self) -> dict:
+        return {
+            "session_id": self.id,
+            "turns": self.turn_count,
+            "window_messages": len(self.turns),
+            "pending_messages": len(self.pending),
+            "summary_tokens": estimate_tokens(self.summary) if self.summary else 0,
+            "history_tokens": self.history_tokens(),
+        }
+
+
+class SessionStore:
+    """LRU + TTL store of chat sessions with token-budgeted history.
+
+    ``summarize(summary, messages)`` is an async callable returning the new
+    summary; if it fails, the evicted turns are folded in as clipped plain
+    text so the history stays within budget either way.
+    """
+
+    def __init__(
+        self,
+        summarize,
+        history_tokens: int = HISTORY_TOKENS,
+        summary_tokens: int = SUMMARY_TOKENS,
+        ttl: float = SESSION_TTL,
+        max_sessions: int = MAX_SESSIONS,
+    ):
+        self.summarize = summarize
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+        self.counters = {
+            "created": 0,
+            "evicted": 0,
+            "expired": 0,
+            "summaries": 0,
+            "summary_errors": 0,
+        }
+        self._tasks = set()
+
+    def _drop_expired(self, now: float):
+        expired = [
+            sid for sid, s in self.sessions.items() if now - s.last_used > self.ttl
+        ]
+        for sid in expired:
+            del self.sessions[sid]
+        self.counters["expired"] += len(expired)
+
+    def get(self, session_id: str):
+        session = self.sessions.get(session_id or "")
+        if session is None or time.monotonic() - session.last_used > self.ttl:
+            return None
+        return session
+
+    def get_or_create(self, session_id: str = None) -> ChatSession:
+        """The live session for ``session_id``, or a new one with a fresh ID.
+
+        Unknown or expired IDs are never adopted, so IDs cannot be guessed
+        into existence.
+        """
+        now = time.monotonic()
+        self._drop_expired(now)
+
+        session = self.sessions.get(session_id or "")
+        if session is None:
+            session = ChatSession(uuid.uuid4().hex)
+            self.sessions[session.id] = session
+            self.counters["created"] += 1
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+                self.counters["evicted"] += 1
+
+        session.last_used = now
+        self.sessions.move_to_end(session.id)
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        return self.sessions.pop(session_id, None) is not None
+
+    def record(self, session: ChatSession, question: str, reply: str):
+        """Add a finished exchange; compacts older turns in the background."""
+        session.add_turn(question, reply)
+        if session.overflow(self.history_tokens):
+            session.evict(self.history_tokens)
+        if session.pending and session._compacting is None:
+            task = asyncio.create_task(self._compact(session))
+            session._compacting = task
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _compact(self, session: ChatSession):
+        try:
+            # Turns evicted while we were summarizing are picked up next round
+            while session.pending:
+                absorbed = list(session.pending)
+                try:
+                    summary = await self.summarize(session.summary, absorbed)
+                    self.counters["summaries"] += 1
+                except Exception as e:
+                    print(f"❌ Chat summary error: {e}, keeping a clipped transcript")
+                    self.counters["summary_errors"] += 1
+                    lines = [f"{m.type}: {m.content}" for m in absorbed]
+                    summary = " ".join([session.summary, *lines]).strip()
+
+                session.summary = _clip(summary.strip(), self.summary_tokens)
+                session.pending = session.pending[len(absorbed) :]
+        finally:
+            session._compacting = None
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "active": len(self.sessions),
+            "max_sessions": self.max_sessions,
+        }
@@ -1,51 +1,88 @@
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional
 from pathlib import Path
 from dotenv import load_dotenv
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_community.vectorstores import Chroma
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import TextLoader
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 from langchain_core.output_parsers import StrOutputParser
 import os
 
+from embedding_store import get_embedding
+from agent_concurrency import make_limiter
+from agent_registry import LazyAgent
+from dataset_watcher import ReloadDeferred
+from document_index import DocumentIndex
+from metrics import timed, with_metrics, CHAT_ROUTES
+from context_assembly import assemble_context
+from text_utils import contains_phrase
+from chat_intents import FaqIndex, match_small_talk, SMALL_TALK_REPLIES
+from chat_sessions import SUMMARY_TOKENS
+from llm_gateway import (
+    get_gateway,
+    default_chat_model,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_BACKGROUND,
+)
+
 load_dotenv()
 
 
 class ChatRequest(BaseModel):
     message: str
     history: List[Dict[str, str]] = []
+    # Server-side history; used when ``history`` is empty
+    session_id: Optional[str] = None
 
 
-data_dir = Path("./")
+# Resolved next to this file so the server can start from any working directory
+data_dir = Path(__file__).resolve().parent
 file_paths = [
     data_dir / "student_guide.txt",
     data_dir / "business_guide.txt",
     data_dir / "faq.txt",
 ]
+faq_file = data_dir / "faq.txt"
 
-docs = []
-for f in file_paths:
-    if f.exists():
-        docs.extend(TextLoader(f).load())
-    else:
-        raise FileNotFoundError(f"Missing file: {f}")
 
-splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=200)
-chunks = splitter.split_documents(docs)
+def load_guide_chunks():
+    docs = []
+    for f in file_paths:
+        if f.exists():
+            docs.extend(TextLoader(f).load())
+        else:
+            raise FileNotFoundError(f"Missing file: {f}")
 
-embedding = GoogleGenerativeAIEmbeddings(
-    model="models/embedding-001",
-)
-vector_store = Chroma.from_documents(chunks, embedding)
-retriever = vector_store.as_retriever(search_kwargs={"k": 4})
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=200)
+    return splitter.split_documents(docs)
+
+
+def build_index():
+    """Load and embed the guides (slow on a cold embedding cache)."""
+    return DocumentIndex("guides", load_guide_chunks(), get_embedding(), k=4)
 
-llm = ChatGoogleGenerativeAI(
-    model="gemini-1.5-flash-latest",
-    temperature=0.2,
-)
+
+def reload_guides():
+    """Upsert changed guide chunks; a no-op until the index has been built."""
+    global faq_index
+    faq_index = FaqIndex.from_file(faq_file)
+    # A build in progress may have read the old guides; retry on the next check
+    if knowledge_base.state == "loading":
+        raise ReloadDeferred("still building: chatbot")
+    if knowledge_base.state != "ready":
+        return {"skipped": "not loaded"}
+    index = knowledge_base.get()
+    return index.sync(load_guide_chunks())
+
+
+# Built on first use (or by the startup warmup), not at import time
+knowledge_base = LazyAgent("chatbot", build_index)
+
+# A handful of Q/A pairs: cheap enough to parse at import
+faq_index = FaqIndex.from_file(faq_file)
+
+llm = default_chat_model("gemini-1.5-flash-latest", temperature=0.2)
 
 rag_prompt = ChatPromptTemplate.from_messages(
     [
@@ -78,16 +115,19 @@ Keep responses concise and helpful."""
 )
 
 
-def format_docs(docs):
-    lines = []
-    for d in docs:
-        if hasattr(d, "page_content"):
-            lines.append(d.page_content)
-        elif isinstance(d, dict) and "page_content" in d:
-            lines.append(d["page_content"])
-        else:
-            lines.append(str(d))
-    return "\n\n".join(lines)
+summary_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You maintain a running summary of a support conversation on the 'SkillVerse' freelance marketplace.
+
+Update the summary with the new messages. Keep the user's goals, details they shared (skills, roles, budgets, problems) and answers already given. Drop greetings and filler.
+
+Return only the updated summary as plain text, at most {max_words} words.""",
+        ),
+        ("human", "Current summary:\n{summary}\n\nNew messages:\n{messages}"),
+    ]
+)
 
 
 def convert_history(history: List[Dict[str, str]]):
@@ -106,35 +146,171 @@ def is_greeting_or_general(message: str) -> bool:
     general_queries = ["help", "what can you do", "how are you"]
 
     msg_lower = message.lower().strip()
+    # Whole words only: "hi" must not match "hire" or "which"
     return (
-        any(greeting in msg_lower for greeting in greetings)
-        or any(query in msg_lower for query in general_queries)
+        any(contains_phrase(msg_lower, greeting) for greeting in greetings)
+        or any(contains_phrase(msg_lower, query) for query in general_queries)
         or len(msg_lower.split()) <= 2
     )
 
 
-fallback_chain = fallback_prompt | llm | StrOutputParser()
+def instant_reply(question: str):
+    """(route, reply, sources) for messages answered without the LLM, else None.
 
+    Pure small talk gets a canned reply and a confident FAQ match gets the
+    stored answer; both take microseconds instead of a model round trip.
+    """
+    intent = match_small_talk(question)
+    if intent:
+        CHAT_ROUTES.inc("small_talk")
+        return "small_talk", SMALL_TALK_REPLIES[intent], []
 
-async def get_response(question: str, history: List):
-    """Route to appropriate chain based on query type and context availability"""
+    hit = faq_index.match(question)
+    if hit:
+        print(f"📌 FAQ match ({hit['score']:.2f}): {hit['question']}")
+        CHAT_ROUTES.inc("faq")
+        return "faq", hit["answer"], [faq_index.source]
+    return None
+
+
+def use_llm(model):
+    """Point every chatbot chain at ``model`` (e.g. a local stand-in)."""
+    global llm, fallback_chain, rag_chain, summary_chain
+    llm = get_gateway().wrap(model, PRIORITY_INTERACTIVE)
+    fallback_chain = with_metrics(fallback_prompt | llm | StrOutputParser(), "chatbot")
+    rag_chain = with_metrics(rag_prompt | llm | StrOutputParser(), "chatbot")
+    # Summaries are background work: they queue behind users' questions
+    summary_chain = with_metrics(
+        summary_prompt | llm | StrOutputParser(), "chatbot_summary"
+    ).with_config(metadata={"llm_priority": PRIORITY_BACKGROUND})
+
+
+use_llm(llm)
+
+# Bounds concurrent Gemini calls from /chat (CHATBOT_CONCURRENCY / AGENT_CONCURRENCY)
+limiter = make_limiter("chatbot")
+
+
+async def route_question(question: str):
+    """Pick a route for the question: ("greeting" | "rag" | "fallback", docs, context)"""
 
     if is_greeting_or_general(question):
         print("👋 Using fallback for greeting/general query")
-        return fallback_chain.invoke({"question": question, "history": history})
+        CHAT_ROUTES.inc("greeting")
+        return "greeting", [], ""
 
     try:
-        relevant_docs = retriever.invoke(question)
-        context = format_docs(relevant_docs)
+        index = await knowledge_base.aget()
+        relevant_docs = await index.asearch(question, "chatbot")
+    except Exception as e:
+        print(f"❌ Retrieval error: {e}, falling back to general response")
+        CHAT_ROUTES.inc("fallback")
+        return "fallback", [], ""
 
-        if context and len(context.strip()) > 50:
-            print(f"📄 Using RAG with context length: {len(context)}")
-            rag_input = {"question": question, "context": context, "history": history}
-            return (rag_prompt | llm | StrOutputParser()).invoke(rag_input)
-        else:
-            print("⚡ No relevant context found, using fallback")
-            return fallback_chain.invoke({"question": question, "history": history})
+    with timed("chatbot", "format"):
+        context = assemble_context(relevant_docs, "chatbot")
+    if context and len(context.strip()) > 50:
+        print(f"📄 Using RAG with context length: {len(context)}")
+        CHAT_ROUTES.inc("rag")
+        return "rag", relevant_docs, context
 
-    except Exception as e:
-        print(f"❌ RAG chain error: {e}, falling back to general response")
-        return fallback_chain.invoke({"question": question, "history": history})
+    print("⚡ No relevant context found, using fallback")
+    CHAT_ROUTES.inc("fallback")
+    return "fallback", [], ""
+
+
+async def summarize_history(
+    summary: str, messages: List, max_tokens: int = SUMMARY_TOKENS
+) -> str:
+    """Fold ``messages`` into the running conversation ``summary``."""
+    transcript = "\n".join(
+        f"{'User' if m.type == 'human' else 'Assistant'}: {m.content}" for m in messages
+    )
+    async with limiter:
+        return await summary_chain.ainvoke(
+            {
+                "summary": summary or "(none yet)",
+                "messages": transcript,
+                "max_words": max(20, int(max_tokens * 0.75)),
+            }
+        )
+
+
+def doc_sources(docs) -> List[str]:
+    sources = []
+    for d in docs:
+        source = getattr(d, "metadata", {}).get("source")
+        if source and Path(source).name not in sources:
+            sources.append(Path(source).name)
+    return sources
+
+
+async def get_response(question: str, history: List):
+    """Route to appropriate chain based on query type and context availability"""
+
+    instant = instant_reply(question)
+    if instant:
+        return instant[1]
+
+    async with limiter:
+        route, _, context = await route_question(question)
+
+        if route == "rag":
+            try:
+                rag_input = {"question": question, "context": context, "history": history}
+                return await rag_chain.ainvoke(rag_input)
+            except Exception as e:
+                print(f"❌ RAG chain error: {e}, falling back to general response")
+
+        return await fallback_chain.ainvoke({"question": question, "history": history})
+
+
+async def stream_response(question: str, history: List):
+    """Stream the reply as (event, data) pairs.
+
+    A ``meta`` event with the route and retrieval info comes first, then one
+    ``token`` event per chunk from the chain, then ``done`` (or ``error``).
+    Instant replies come as a single ``token`` event.
+    """
+
+    instant = instant_reply(question)
+    if instant:
+        route, reply, sources = instant
+        yield "meta", {"route": route, "context_length": 0, "sources": sources}
+        yield "token", {"text": reply}
+        yield "done", {}
+        return
+
+    async with limiter:
+        route, docs, context = await route_question(question)
+        yield "meta", {
+            "route": route,
+            "context_length": len(context),
+            "sources": doc_sources(docs),
+        }
+
+        streamed = False
+        if route == "rag":
+            try:
+                rag_input = {"question": question, "context": context, "history": history}
+                async for chunk in rag_chain.astream(rag_input):
+                    streamed = True
+                    yield "token", {"text": chunk}
+                yield "done", {}
+                return
+            except Exception as e:
+                print(f"❌ RAG chain error: {e}, falling back to general response")
+                if streamed:
+                    # Part of the answer is already on the wire; don't mix in another one
+                    yield "error", {"error": "Response generation failed"}
+                    return
+
+        try:
+            async for chunk in fallback_chain.astream(
+                {"question": question, "history": history}
+            ):
+                yield "token", {"text": chunk}
+            yield "done", {}
+        except Exception as e:
+            print(f"❌ Fallback chain error: {e}")
+            yield "error", {"error": "Response generation failed"}
@@ -0,0 +1,130 @@
+import os
+from dotenv import load_dotenv
+
+from metrics import CONTEXT_CHARS_REMOVED
+from text_utils import estimate_tokens, tokenize
+
+load_dotenv()
+
+# Tokens of retrieved context per agent; CONTEXT_TOKENS_<AGENT> overrides one
+CONTEXT_TOKENS = int(os.getenv("CONTEXT_TOKENS", "1500"))
+DEFAULT_BUDGETS = {"chatbot": 1000, "job": 1500, "user": 1500}
+
+# Chunks sharing at least this share of word 3-grams with a kept one are dropped
+NEAR_DUPLICATE = float(os.getenv("CONTEXT_NEAR_DUPLICATE", "0.8"))
+# Overlaps shorter than this are coincidences, not splitter overlap
+MIN_OVERLAP = 40
+# Longest overlap looked for; the guides are split with chunk_overlap=200
+MAX_OVERLAP = 400
+# Don't bother keeping a truncated tail shorter than this many tokens
+MIN_TAIL_TOKENS = 40
+
+
+def context_budget(agent: str) -> int:
+    value = os.getenv(f"CONTEXT_TOKENS_{agent.upper()}")
+    return int(value) if value else DEFAULT_BUDGETS.get(agent, CONTEXT_TOKENS)
+
+
+def _text(doc) -> str:
+    if hasattr(doc, "page_content"):
+        return doc.page_content
+    if isinstance(doc, dict) and "page_content" in doc:
+        return doc["page_content"]
+    return str(doc)
+
+
+def _shingles(text: str) -> frozenset:
+    words = tokenize(text)
+    if len(words) < 3:
+        return frozenset([tuple(words)])
+    return frozenset(zip(words, words[1:], words[2:]))
+
+
+def _overlap(before: str, after: str) -> int:
+    """Length of the longest suffix of ``before`` that starts ``after``."""
+    head = after[:MIN_OVERLAP]
+    if len(head) < MIN_OVERLAP:
+        return 0
+    start = max(0, len(before) - MAX_OVERLAP)
+    pos = before.find(head, start)
+    while pos != -1:
+        if after.startswith(before[pos:]):
+            return len(before) - pos
+        pos = before.find(head, pos + 1)
+    return 0
+
+
+def _strip_overlap(text: str, kept: list[str]) -> str:
+    """``text`` minus any head or tail it repeats from an already kept chunk."""
+    for other in kept:
+        cut = _overlap(other, text)
+        if cut:
+            text = text[cut:]
+        cut = _overlap(text, other)
+        if cut:
+            text = text[:-cut]
+    return text.strip()
+
+
+def _truncate(text: str, tokens: int) -> str:
+    limit = tokens * 4
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit)
+    return text[: cut if cut > limit // 2 else limit].rstrip() + " …"
+
+
+def assemble_context(docs, agent: str, budget: int = None, truncate: bool = True):
+    """Join retrieved ``docs`` (best first) into a prompt context for ``agent``.
+
+    Exact and near-duplicate chunks are dropped, text a chunk repeats from a
+    better-ranked one (splitter overlap) is cut, and chunks are added in
+    relevance order until ``budget`` tokens (default: ``context_budget``) are
+    used. With ``truncate``, the chunk that crosses the budget is cut at a
+    word boundary; otherwise it is left out (e.g. JSON records, which would
+    stop parsing).
+    """
+    budget = context_budget(agent) if budget is None else budget
+    kept, kept_shingles, used = [], [], 0
+    removed = {"duplicate": 0, "overlap": 0, "budget": 0}
+
+    for doc in docs:
+        original = _text(doc).strip()
+        if not original:
+            continue
+        if used >= budget:
+            removed["budget"] += len(original)
+            continue
+
+        shingles = _shingles(original)
+        if any(
+            len(shingles & other) >= NEAR_DUPLICATE * min(len(shingles), len(other))
+            for other in kept_shingles
+        ):
+            removed["duplicate"] += len(original)
+            continue
+
+        text = _strip_overlap(original, kept)
+        removed["overlap"] += len(original) - len(text)
+        if not text:
+            continue
+
+        tokens = estimate_tokens(text)
+        if used + tokens > budget:
+            remaining = budget - used
+            if not truncate or remaining < MIN_TAIL_TOKENS:
+                removed["budget"] += len(text)
+                # A smaller record further down may still fit
+                continue
+            short = _truncate(text, remaining)
+            removed["budget"] += len(text) - len(short)
+            text, tokens = short, estimate_tokens(short)
+
+        kept.append(text)
+        kept_shingles.append(shingles)
+        used += tokens
+
+    for reason, chars in removed.items():
+        if chars:
+            CONTEXT_CHARS_REMOVED.inc(agent, reason, amount=chars)
+    return "\n\n".join(kept)
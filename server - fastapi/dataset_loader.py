@@ -0,0 +1,83 @@
+from pathlib import Path
+import hashlib
+import json
+from langchain_core.documents import Document
+
+
+def load_records(data_file) -> list[dict]:
+    """Load a JSON dataset that holds a list of records."""
+    data_file = Path(data_file)
+    if not data_file.exists():
+        raise FileNotFoundError(f"Missing dataset: {data_file}")
+
+    with open(data_file, "r", encoding="utf-8") as f:
+        records = json.load(f)
+
+    if not isinstance(records, list):
+        raise ValueError(f"Expected a list of records in {data_file}")
+    return records
+
+
+def record_id(record: dict, key_fields: tuple) -> str:
+    """Stable identifier for a record.
+
+    Uses ``_id``/``id`` when the dataset has one, otherwise a short hash of the
+    fields that identify the record (so edits to other fields keep the same ID).
+    """
+    for field in ("_id", "id"):
+        if record.get(field):
+            return str(record[field])
+    identity = json.dumps([record.get(f) for f in key_fields], sort_keys=True)
+    return hashlib.sha1(identity.encode("utf-8")).hexdigest()[:12]
+
+
+def job_id(job: dict) -> str:
+    return record_id(job, ("client", "title"))
+
+
+def user_id(user: dict) -> str:
+    return record_id(user, ("email",))
+
+
+def _join(values) -> str:
+    # Chroma metadata only accepts scalars, so lists are stored comma-joined
+    return ", ".join(str(v) for v in values or [])
+
+
+def job_to_document(job: dict) -> Document:
+    return Document(
+        page_content=json.dumps({"id": job_id(job), **job}, ensure_ascii=False),
+        metadata={
+            "job_id": job_id(job),
+            "title": job.get("title", ""),
+            "budget": float(job.get("budget") or 0),
+            "status": job.get("status", ""),
+            "skillsRequired": _join(job.get("skillsRequired")),
+            "client": str(job.get("client", "")),
+        },
+    )
+
+
+def user_to_document(user: dict) -> Document:
+    return Document(
+        page_content=json.dumps({"id": user_id(user), **user}, ensure_ascii=False),
+        metadata={
+            "user_id": user_id(user),
+            "fullname": user.get("fullname", ""),
+            "headline": user.get("headline", ""),
+            "skills": _join(user.get("skills")),
+            "hourlyRate": float(user.get("hourlyRate") or 0),
+            "stars": float(user.get("stars") or 0),
+            "role": user.get("role", ""),
+        },
+    )
+
+
+def load_job_documents(data_file) -> list[Document]:
+    """One document per job posting, with structured metadata for filtering."""
+    return [job_to_document(job) for job in load_records(data_file)]
+
+
+def load_user_documents(data_file) -> list[Document]:
+    """One document per user profile, with structured metadata for filtering."""
+    return [user_to_document(user) for user in load_records(data_file)]
@@ -0,0 +1,91 @@
+from pathlib import Path
+import asyncio
+
+
+def files_fingerprint(paths) -> tuple:
+    """(path, mtime, size) for each file; missing files are recorded as such."""
+    fingerprint = []
+    for path in paths:
+        path = Path(path)
+        try:
+            st = path.stat()
+            fingerprint.append((str(path), st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            fingerprint.append((str(path), None, None))
+    return tuple(fingerprint)
+
+
+class ReloadDeferred(Exception):
+    """Raised by a reload callback that cannot apply a change yet, e.g. while
+    an agent is still being built from the old file. The watcher keeps the
+    old fingerprint, so the next check runs the callback again."""
+
+
+class DatasetWatcher:
+    """Polls data files and runs a reload callback when they change.
+
+    Callbacks are synchronous and run in a worker thread, so in-flight
+    requests keep being served from the current data while a reload runs.
+    """
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self.watches = []
+        self._task = None
+
+    def watch(self, name: str, paths, callback, on_reload=()):
+        """Run ``callback`` when ``paths`` change; then each of ``on_reload``
+        (plain functions, on the event loop) once the reload succeeded."""
+        self.watches.append(
+            {
+                "name": name,
+                "paths": [Path(p) for p in paths],
+                "callback": callback,
+                "on_reload": list(on_reload),
+                "fingerprint": files_fingerprint(paths),
+                "lock": asyncio.Lock(),
+            }
+        )
+
+    async def _reload(self, watch, fingerprint):
+        async with watch["lock"]:
+            try:
+                result = await asyncio.to_thread(watch["callback"])
+                print(f"🔄 Reloaded {watch['name']}: {result}")
+            except ReloadDeferred as e:
+                print(f"⏳ Reload of {watch['name']} deferred: {e}")
+                return {"deferred": str(e)}
+            except Exception as e:
+                # Keep the old fingerprint so the next poll retries
+                print(f"❌ Reload of {watch['name']} failed: {e}")
+                return {"error": f"{type(e).__name__}: {e}"}
+            watch["fingerprint"] = fingerprint
+            for hook in watch["on_reload"]:
+                hook()
+            return result
+
+    async def check(self, force: bool = False) -> dict:
+        """Reload every watch whose files changed (or all of them with ``force``)."""
+        results = {}
+        for watch in self.watches:
+            fingerprint = files_fingerprint(watch["paths"])
+            if force or fingerprint != watch["fingerprint"]:
+                results[watch["name"]] = await self._reload(watch, fingerprint)
+        return results
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                print(f"❌ Dataset watcher error: {e}")
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import threading
+import uuid
+from langchain_community.vectorstores import Chroma
+
+from metrics import timed
+from vector_index import (
+    MmapVectorStore,
+    NumpyVectorStore,
+    index_setting,
+    VECTOR_BACKEND,
+    VECTOR_DTYPE,
+)
+
+_client_lock = threading.Lock()
+
+
+def content_id(doc) -> str:
+    """ID derived from a document's text and metadata, so edits change it."""
+    payload = json.dumps([doc.page_content, doc.metadata], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class DocumentIndex:
+    """A vector store plus the content IDs it holds.
+
+    ``sync`` diffs a fresh list of documents against those IDs and only adds
+    new/changed documents and deletes removed ones, so a dataset edit costs
+    one embedding per changed record instead of a full rebuild.
+
+    ``backend`` is ``"chroma"`` for a private in-process Chroma collection,
+    ``"mmap"`` for a read-only :class:`MmapVectorStore` shared by every worker
+    process on the host, or ``"numpy"`` for a compact in-process
+    :class:`NumpyVectorStore`. It defaults to ``VECTOR_BACKEND_<NAME>`` (e.g.
+    ``VECTOR_BACKEND_JOBS``), then ``VECTOR_BACKEND``; ``VECTOR_DTYPE[_<NAME>]``
+    picks the numpy backend's storage type the same way.
+    """
+
+    def __init__(self, name: str, docs, embedding, k: int = 4, backend: str = None):
+        self.name = name
+        self.embedding = embedding
+        self.k = k
+        self.backend = backend or index_setting(name, "VECTOR_BACKEND", VECTOR_BACKEND)
+        self._lock = threading.Lock()
+
+        docs = {content_id(d): d for d in docs}
+        if self.backend == "mmap":
+            self.vector_store = MmapVectorStore(name, embedding)
+            self.vector_store.build(docs)
+        else:
+            if self.backend == "numpy":
+                dtype = index_setting(name, "VECTOR_DTYPE", VECTOR_DTYPE)
+                self.vector_store = NumpyVectorStore(embedding, dtype=dtype)
+            elif self.backend == "chroma":
+                # In-process Chroma clients share one system; every index needs
+                # its own collection, and creating clients concurrently is not
+                # thread-safe.
+                with _client_lock:
+                    self.vector_store = Chroma(
+                        collection_name=f"{name}-{uuid.uuid4().hex[:8]}",
+                        embedding_function=embedding,
+                    )
+            else:
+                raise ValueError(f"Unknown vector backend: {self.backend!r}")
+            if docs:
+                self.vector_store.add_documents(list(docs.values()), ids=list(docs))
+        self.ids = set(docs)
+        self.retriever = self.vector_store.as_retriever(search_kwargs={"k": k})
+
+    def __len__(self):
+        return len(self.ids)
+
+    async def asearch(self, query: str, agent: str, k: int = None, filter: dict = None):
+        """Like ``retriever.ainvoke`` but timing embedding and search separately.
+
+        ``filter`` restricts the search by metadata, in Chroma's form
+        (``{"job_id": {"$in": [...]}}``), whichever backend is in use.
+        """
+        with timed(agent, "embed"):
+            vector = await self.embedding.aembed_query(query)
+        kwargs = {"filter": filter} if filter else {}
+        with timed(agent, "retrieve"):
+            return await self.vector_store.asimilarity_search_by_vector(
+                vector, k=k or self.k, **kwargs
+            )
+
+    def sync(self, docs) -> dict:
+        fresh = {content_id(d): d for d in docs}
+        with self._lock:
+            added = [doc_id for doc_id in fresh if doc_id not in self.ids]
+            removed = [doc_id for doc_id in self.ids if doc_id not in fresh]
+
+            if isinstance(self.vector_store, MmapVectorStore):
+                # Read-only files: switch to a new build (unchanged rows are reused)
+                if added or removed:
+                    self.vector_store.build(fresh)
+            else:
+                # Add before delete so a changed record is never missing from search
+                if added:
+                    self.vector_store.add_documents(
+                        [fresh[i] for i in added], ids=added
+                    )
+                if removed:
+                    self.vector_store.delete(ids=removed)
+            self.ids = set(fresh)
+
+        return {"added": len(added), "removed": len(removed), "total": len(self.ids)}
@@ -0,0 +1,131 @@
+from pathlib import Path
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from langchain_core.embeddings import Embeddings
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_EMBEDDING_MODEL = "models/embedding-001"
+DEFAULT_CACHE_PATH = Path(
+    os.getenv("EMBEDDING_CACHE_PATH", Path(__file__).parent / ".embedding_cache.sqlite3")
+)
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that persists vectors on disk.
+
+    Vectors are keyed by the embedding model name, the kind of text
+    (document or query) and the SHA-256 of the text itself, so a restart only
+    pays for chunks that are new or have changed since the last run.
+    """
+
+    def __init__(self, underlying: Embeddings, model: str, cache_path=DEFAULT_CACHE_PATH):
+        self.underlying = underlying
+        self.model = model
+        self.cache_path = Path(cache_path)
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.cache_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _key(self, kind: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model}:{kind}:{digest}"
+
+    def _load(self, keys: list[str]) -> dict:
+        found = {}
+        with self._lock:
+            # SQLite caps the number of bound parameters, so look up in slices
+            for i in range(0, len(keys), 500):
+                batch = keys[i : i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                found.update((k, json.loads(v)) for k, v in rows)
+        return found
+
+    def _save(self, items: dict):
+        if not items:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(k, json.dumps(v)) for k, v in items.items()],
+            )
+            self._conn.commit()
+
+    def _embed_cached(self, kind: str, texts: list[str], embed_missing):
+        keys = [self._key(kind, t) for t in texts]
+        cached = self._load(list(dict.fromkeys(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+
+        if missing:
+            vectors = embed_missing(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self._save(fresh)
+            cached.update(fresh)
+
+        return [cached[k] for k in keys]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._embed_cached("doc", texts, self.underlying.embed_documents)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed_cached("query", [text], self._embed_query_batch)[0]
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """Embed many queries with one upstream call for the cache misses."""
+        return self._embed_cached("query", texts, self._embed_query_batch)
+
+    async def aembed_queries(self, texts: list[str]) -> list[list[float]]:
+        return await asyncio.to_thread(self.embed_queries, texts)
+
+    def _embed_query_batch(self, texts: list[str]) -> list[list[float]]:
+        if len(texts) > 1 and isinstance(self.underlying, GoogleGenerativeAIEmbeddings):
+            return self.underlying.embed_documents(texts, task_type="retrieval_query")
+        return [self.underlying.embed_query(t) for t in texts]
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def get_embedding(model: str = DEFAULT_EMBEDDING_MODEL) -> CachedEmbeddings:
+    """Return the process-wide cached embeddings for ``model``.
+
+    Every agent and the chatbot share one instance per model so identical
+    chunks (e.g. ``jobs_dataset.json`` used by several agents) are embedded once.
+    """
+    with _shared_lock:
+        if model not in _shared:
+            _shared[model] = CachedEmbeddings(
+                GoogleGenerativeAIEmbeddings(model=model), model=model
+            )
+        return _shared[model]
+
+
+def set_embedding(embedding: CachedEmbeddings, model: str = DEFAULT_EMBEDDING_MODEL):
+    """Make ``get_embedding(model)`` return ``embedding`` (e.g. a local stand-in).
+
+    Only affects components built afterwards, so call it before importing
+    ``main``.
+    """
+    with _shared_lock:
+        _shared[model] = embedding
@@ -1,34 +1,43 @@
 from pathlib import Path
+import asyncio
 import json
-from langchain_community.vectorstores import Chroma
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import TextLoader
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 from langchain_core.output_parsers import StrOutputParser
+
+from embedding_store import get_embedding
+from document_index import DocumentIndex
+from dataset_loader import load_records, job_to_document
+from job_filters import JobMetadataIndex, DEFAULT_PAGE_SIZE
+from agent_concurrency import make_limiter
+from llm_gateway import get_gateway, default_chat_model, PRIORITY_INTERACTIVE
+from context_assembly import assemble_context
+from metrics import timed, with_metrics, PARSE_FAILURES
+from streaming import aiter_json_array
 import os
 
 
 class JobRecommenderAgent:
-    def __init__(self, llm=None, data_file="jobs_dataset.json"):
+    def __init__(self, llm=None, data_file="jobs_dataset.json", max_concurrency=None):
         self.data_file = Path(data_file)
+        self.limiter = make_limiter("job_agent", max_concurrency)
 
-        if not self.data_file.exists():
-            raise FileNotFoundError(f"Missing dataset: {self.data_file}")
+        jobs = load_records(self.data_file)
 
-        with open(self.data_file, "r", encoding="utf-8") as f:
-            dataset_text = f.read()
+        # Status/budget/skill filters, resolved to job IDs before vector search
+        self.catalog = JobMetadataIndex(jobs)
 
-        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        chunks = splitter.create_documents([dataset_text])
+        # One document per job posting so every hit is a whole record
+        docs = [job_to_document(j) for j in jobs]
 
-        embedding = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-        self.vector_store = Chroma.from_documents(chunks, embedding)
-        self.retriever = self.vector_store.as_retriever(search_kwargs={"k": 4})
+        self.embedding = get_embedding()
+        self.k = 8
+        self.index = DocumentIndex("jobs", docs, self.embedding, k=self.k)
+        self.vector_store = self.index.vector_store
+        self.retriever = self.index.retriever
 
-        self.llm = llm or ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash-latest", temperature=0.2
+        self.llm = get_gateway().wrap(
+            llm or default_chat_model("gemini-1.5-flash-latest", temperature=0.2), PRIORITY_INTERACTIVE
         )
 
         self.job_prompt = ChatPromptTemplate.from_messages(
@@ -57,27 +66,160 @@ class JobRecommenderAgent:
             ]
         )
 
-        self.chain = self.job_prompt | self.llm | StrOutputParser()
+        self.chain = with_metrics(self.job_prompt | self.llm | StrOutputParser(), "job")
+
+    def reload(self):
+        """Re-read the dataset: swap in a fresh filter index, upsert changed postings."""
+        jobs = load_records(self.data_file)
+        self.catalog = JobMetadataIndex(jobs)
+        return self.index.sync([job_to_document(j) for j in jobs])
 
     def format_docs(self, docs):
-        return "\n\n".join(d.page_content for d in docs)
+        # Whole records only: a cut-off JSON object is worse than a missing one
+        return assemble_context(docs, "job", truncate=False)
+
+    def _parse_reply(self, raw_reply: str):
+        with timed("job", "parse"):
+            try:
+                if raw_reply.strip().startswith("```"):
+                    raw_reply = raw_reply.strip().strip("`").replace("json", "", 1).strip()
+
+                jobs = json.loads(raw_reply)
+                return {"jobs": jobs}
+            except Exception:
+                PARSE_FAILURES.inc("job")
+                return {"text": raw_reply}
+
+    def _not_enough_context(self):
+        return {
+            "error": "I couldn’t find enough info in the guides. Please give me more details about your skills or career goals."
+        }
 
     def recommend(self, query: str):
         relevant_docs = self.retriever.invoke(query)
         context = self.format_docs(relevant_docs)
 
         if not context or len(context.strip()) < 50:
-            return {
-                "error": "I couldn’t find enough info in the guides. Please give me more details about your skills or career goals."
-            }
+            return self._not_enough_context()
 
         raw_reply = self.chain.invoke({"query": query, "context": context})
+        return self._parse_reply(raw_reply)
 
-        try:
-            if raw_reply.strip().startswith("```"):
-                raw_reply = raw_reply.strip().strip("`").replace("json", "", 1).strip()
+    async def _agenerate(self, query: str, relevant_docs):
+        with timed("job", "format"):
+            context = self.format_docs(relevant_docs)
+        if not context or len(context.strip()) < 50:
+            return self._not_enough_context()
+
+        async with self.limiter:
+            raw_reply = await self.chain.ainvoke({"query": query, "context": context})
+        return self._parse_reply(raw_reply)
+
+    @staticmethod
+    def _paged(filters, page, page_size) -> bool:
+        return bool(filters) or page != 1 or page_size is not None
+
+    async def _asearch(self, query: str, filters=None, page=1, page_size=None):
+        """Retrieved postings for one page of results, and how many jobs match.
+
+        Without ``filters`` or paging this is the plain top-``k`` search. With
+        them, the metadata index picks the matching job IDs first and the
+        vector search only ranks those, so the context never holds a posting
+        the filters exclude.
+        """
+        if not self._paged(filters, page, page_size):
+            return await self.index.asearch(query, "job"), len(self.index)
+
+        page_size = page_size or DEFAULT_PAGE_SIZE
+        offset = (page - 1) * page_size
+        search_filter = None
+        total = len(self.catalog)
+        if filters:
+            with timed("job", "filter"):
+                ids = self.catalog.ids(filters)
+            total = len(ids)
+            search_filter = {"job_id": {"$in": ids}}
+        if offset >= total:
+            # Nothing on this page: skip the embedding and the LLM call
+            return [], total
+        docs = await self.index.asearch(
+            query, "job", k=offset + page_size, filter=search_filter
+        )
+        return docs[offset:], total
+
+    async def arecommend(self, query: str, filters=None, page=1, page_size=None):
+        """Recommended jobs for ``query``; see ``_asearch`` for the paging.
+
+        Filtered or paged replies also carry ``total``, the number of postings
+        matching the filters.
+        """
+        relevant_docs, total = await self._asearch(query, filters, page, page_size)
+        if not self._paged(filters, page, page_size):
+            return await self._agenerate(query, relevant_docs)
+        if not relevant_docs:
+            return {"jobs": [], "total": total}
+        return {**await self._agenerate(query, relevant_docs), "total": total}
+
+    async def astream_recommend(self, query: str, filters=None, page=1, page_size=None):
+        """Stream the recommendation as (event, data) pairs.
+
+        One ``job`` event per posting as soon as its object is complete in the
+        LLM reply, then ``done`` with the count (or ``error``). Filtered or
+        paged streams also report ``total`` in ``done``.
+        """
+        paged = self._paged(filters, page, page_size)
+        relevant_docs, total = await self._asearch(query, filters, page, page_size)
+        if paged and not relevant_docs:
+            yield "done", {"count": 0, "total": total}
+            return
+        with timed("job", "format"):
+            context = self.format_docs(relevant_docs)
+        if not context or len(context.strip()) < 50:
+            yield "error", self._not_enough_context()
+            return
 
-            jobs = json.loads(raw_reply)
-            return {"jobs": jobs}
-        except Exception:
-            return {"text": raw_reply}
+        count = 0
+        try:
+            async with self.limiter:
+                chunks = self.chain.astream({"query": query, "context": context})
+                async for job in aiter_json_array(chunks):
+                    count += 1
+                    yield "job", job
+        except ValueError:
+            PARSE_FAILURES.inc("job")
+            yield "error", {"error": "Failed to parse model reply"}
+            return
+        yield "done", {"count": count, "total": total} if paged else {"count": count}
+
+    async def arecommend_batch(self, queries: list[str]):
+        """Recommend for many queries: one batched embedding call, then
+        retrievals, then generations fanned out under the agent's limiter.
+        Returns one result per query; a failing item carries an ``error``."""
+        try:
+            with timed("job", "embed"):
+                vectors = await self.embedding.aembed_queries(queries)
+        except Exception as e:
+            vectors = [e] * len(queries)
+
+        async def search(vector):
+            if isinstance(vector, Exception):
+                raise vector
+            return await self.vector_store.asimilarity_search_by_vector(vector, k=self.k)
+
+        with timed("job", "retrieve"):
+            hits = await asyncio.gather(
+                *(search(v) for v in vectors), return_exceptions=True
+            )
+
+        async def run(query, docs):
+            if isinstance(docs, Exception):
+                raise docs
+            return await self._agenerate(query, docs)
+
+        replies = await asyncio.gather(
+            *(run(q, docs) for q, docs in zip(queries, hits)), return_exceptions=True
+        )
+        return [
+            {"error": f"{type(r).__name__}: {r}"} if isinstance(r, Exception) else r
+            for r in replies
+        ]
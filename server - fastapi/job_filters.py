@@ -0,0 +1,125 @@
+from collections import defaultdict
+import numpy as np
+
+from dataset_loader import job_id
+
+# Results per page of /recommend when the request does not say
+DEFAULT_PAGE_SIZE = 8
+# Postings past ~20 would not fit the job agent's context budget anyway
+MAX_PAGE_SIZE = 20
+
+
+def _strings(value) -> list[str]:
+    """A list of non-empty strings from a list or a comma-separated string."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    elif not isinstance(value, (list, tuple, set)):
+        raise ValueError(f"Expected a list or a comma-separated string, got {value!r}")
+    return [str(v).strip() for v in value if str(v).strip()]
+
+
+def _number(value, name: str):
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number") from None
+
+
+def parse_job_filters(data: dict) -> dict:
+    """Structured job filters from a request body; {} when there are none.
+
+    Accepted keys: ``status`` (one or several), ``budget_min``/``budget_max``
+    (or ``budget: {"min", "max"}``), ``required_skills`` (a job must list all
+    of them) and ``optional_skills`` (it must list at least one). Raises
+    ValueError on malformed values.
+    """
+    budget = data.get("budget") or {}
+    if not isinstance(budget, dict):
+        raise ValueError('budget must be an object like {"min": 50, "max": 150}')
+
+    filters = {
+        "status": [s.lower() for s in _strings(data.get("status"))],
+        "budget_min": _number(data.get("budget_min", budget.get("min")), "budget_min"),
+        "budget_max": _number(data.get("budget_max", budget.get("max")), "budget_max"),
+        "required_skills": _strings(data.get("required_skills")),
+        "optional_skills": _strings(data.get("optional_skills")),
+    }
+    if (
+        filters["budget_min"] is not None
+        and filters["budget_max"] is not None
+        and filters["budget_min"] > filters["budget_max"]
+    ):
+        raise ValueError("budget_min is greater than budget_max")
+    return {key: value for key, value in filters.items() if value not in (None, [])}
+
+
+def parse_page(data: dict):
+    """``(page, page_size)`` from a request body; pages start at 1."""
+    try:
+        page = int(data.get("page") or 1)
+        page_size = int(data.get("page_size") or DEFAULT_PAGE_SIZE)
+    except (TypeError, ValueError):
+        raise ValueError("page and page_size must be integers") from None
+    if page < 1:
+        raise ValueError("page must be at least 1")
+    if not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise ValueError(f"page_size must be between 1 and {MAX_PAGE_SIZE}")
+    return page, page_size
+
+
+class JobMetadataIndex:
+    """Exact structured filtering over every job posting.
+
+    Status and skills come from inverted indexes, budgets are a NumPy column,
+    so a filter costs a few array operations however many jobs there are.
+    ``ids(filters)`` gives the matching job IDs, which the vector search is
+    then restricted to.
+    """
+
+    def __init__(self, jobs: list[dict]):
+        self.job_ids = [job_id(j) for j in jobs]
+        self.budgets = np.array(
+            [float(j.get("budget") or 0) for j in jobs], dtype=np.float64
+        )
+
+        statuses, skills = defaultdict(list), defaultdict(list)
+        for row, job in enumerate(jobs):
+            statuses[str(job.get("status", "")).lower()].append(row)
+            for skill in {s.lower() for s in job.get("skillsRequired") or []}:
+                skills[skill].append(row)
+        self.status_index = {k: np.array(v, dtype=np.intp) for k, v in statuses.items()}
+        self.skill_index = {k: np.array(v, dtype=np.intp) for k, v in skills.items()}
+
+    def __len__(self):
+        return len(self.job_ids)
+
+    def _rows_with(self, index: dict, keys) -> np.ndarray:
+        """Mask of rows listed under any of ``keys``."""
+        mask = np.zeros(len(self.job_ids), dtype=bool)
+        for key in keys:
+            rows = index.get(key.lower())
+            if rows is not None:
+                mask[rows] = True
+        return mask
+
+    def match(self, filters: dict) -> np.ndarray:
+        """Row positions of the jobs passing every filter."""
+        mask = np.ones(len(self.job_ids), dtype=bool)
+        if filters.get("status"):
+            mask &= self._rows_with(self.status_index, filters["status"])
+        if filters.get("budget_min") is not None:
+            mask &= self.budgets >= filters["budget_min"]
+        if filters.get("budget_max") is not None:
+            mask &= self.budgets <= filters["budget_max"]
+        for skill in filters.get("required_skills", ()):
+            mask &= self._rows_with(self.skill_index, [skill])
+        if filters.get("optional_skills"):
+            mask &= self._rows_with(self.skill_index, filters["optional_skills"])
+        return np.flatnonzero(mask)
+
+    def ids(self, filters: dict) -> list[str]:
+        return [self.job_ids[row] for row in self.match(filters)]
@@ -0,0 +1,508 @@
+from collections import Counter
+from typing import Any, AsyncIterator, Iterator, List, Optional
+import asyncio
+import contextlib
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import queue
+import random
+import threading
+import time
+from dotenv import load_dotenv
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from metrics import GATEWAY_EVENTS, STAGE_SECONDS
+
+load_dotenv()
+
+# Lower runs first when calls are queued
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BACKGROUND = 2
+
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_MARKERS = (
+    "ResourceExhausted",
+    "RESOURCE_EXHAUSTED",
+    "ServiceUnavailable",
+    "UNAVAILABLE",
+    "DeadlineExceeded",
+    "TooManyRequests",
+    "quota",
+    "rate limit",
+)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Timeouts, connection drops, quota and 5xx errors are worth retrying."""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    for attr in ("code", "status_code"):
+        if getattr(error, attr, None) in RETRYABLE_CODES:
+            return True
+    text = f"{type(error).__name__} {error}"
+    return any(marker in text for marker in RETRYABLE_MARKERS)
+
+
+class TokenBucket:
+    """``rate`` calls per second on average, bursts of up to ``burst``.
+
+    Shared by the event loop and worker threads, hence the thread lock.
+    A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self) -> float:
+        """Take a token and return 0, or return how long to wait for one."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        while (wait := self._take()) > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self):
+        if self.rate <= 0:
+            return
+        while (wait := self._take()) > 0:
+            time.sleep(wait)
+
+
+class _Waiter:
+    __slots__ = ("wake", "granted", "cancelled")
+
+    def __init__(self, wake):
+        self.wake = wake
+        self.granted = False
+        self.cancelled = False
+
+
+class PriorityGate:
+    """At most ``limit`` holders; queued callers are let in by priority
+    (lowest number first), first come first served within a priority.
+
+    Coroutines and worker threads queue on the same gate, hence the lock.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self) -> int:
+        with self._lock:
+            return sum(1 for *_, w in self._waiters if not (w.granted or w.cancelled))
+
+    def _enqueue(self, priority: int, wake) -> Optional[_Waiter]:
+        """Take a free slot and return None, or queue and return the waiter."""
+        with self._lock:
+            if self.active < self.limit and not any(
+                not (w.granted or w.cancelled) for *_, w in self._waiters
+            ):
+                self.active += 1
+                return None
+            waiter = _Waiter(wake)
+            heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+            return waiter
+
+    async def acquire(self, priority: int):
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+
+        def wake():
+            try:
+                loop.call_soon_threadsafe(_resolve, fut)
+            except RuntimeError:
+                # The waiter's loop is closed: nobody will take the slot
+                self.release()
+
+        waiter = self._enqueue(priority, wake)
+        if waiter is None:
+            return
+        try:
+            await fut
+        except asyncio.CancelledError:
+            with self._lock:
+                waiter.cancelled = True
+                granted = waiter.granted
+            # Handed a slot just as we were cancelled: pass it on
+            if granted:
+                self.release()
+            raise
+
+    def acquire_sync(self, priority: int):
+        """Blocking :meth:`acquire` for worker threads. Never call it on an
+        event loop's thread: it would stall every coroutine queued behind it."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError("acquire_sync called from a running event loop")
+        granted = threading.Event()
+        if self._enqueue(priority, granted.set) is not None:
+            granted.wait()
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                *_, waiter = heapq.heappop(self._waiters)
+                if not waiter.cancelled:
+                    # The slot moves straight to the waiter; ``active`` is unchanged
+                    waiter.granted = True
+                    break
+            else:
+                self.active -= 1
+                return
+        waiter.wake()
+
+
+def _resolve(fut):
+    if not fut.done():
+        fut.set_result(None)
+
+
+def _threaded(iterate, timeout: float):
+    """Yield from ``iterate()`` run on a daemon thread, waiting at most
+    ``timeout`` seconds for each item. A blocking upstream call cannot be
+    interrupted, so on timeout it is abandoned and left to finish alone."""
+    items = queue.Queue()
+    stop = threading.Event()
+
+    def produce():
+        try:
+            iterator = iter(iterate())
+            for item in iterator:
+                if stop.is_set():
+                    close = getattr(iterator, "close", None)
+                    if close:
+                        close()
+                    return
+                items.put((True, item))
+            items.put((False, None))
+        except BaseException as e:
+            items.put((False, e))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            try:
+                ok, item = items.get(timeout=timeout)
+            except queue.Empty:
+                raise TimeoutError(f"no reply from the model in {timeout}s") from None
+            if not ok:
+                if item is not None:
+                    raise item
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+class LLMGateway:
+    """The one way out to the model provider.
+
+    Every call waits for a concurrency slot (by priority) and a rate-limit
+    token, runs under a timeout and is retried with full-jitter backoff on
+    transient errors. Identical prompts already in flight share one upstream
+    call instead of spending quota twice.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "600")),
+        burst: int = int(os.getenv("LLM_BURST", "20")),
+        max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "16")),
+        timeout: float = float(os.getenv("LLM_TIMEOUT", "30")),
+        max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "2")),
+        backoff: float = float(os.getenv("LLM_BACKOFF", "0.5")),
+        backoff_cap: float = float(os.getenv("LLM_BACKOFF_CAP", "8")),
+    ):
+        self.bucket = TokenBucket(requests_per_minute / 60, burst)
+        self.gate = PriorityGate(max_concurrency)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_cap = backoff_cap
+        self.counters = Counter()
+        self._inflight = {}
+
+    def wrap(self, llm, priority: int = PRIORITY_NORMAL) -> "GatewayChatModel":
+        """``llm`` routed through this gateway (re-wrapping just changes priority)."""
+        if isinstance(llm, GatewayChatModel):
+            llm = llm.underlying
+        return GatewayChatModel(underlying=llm, gateway=self, priority=priority)
+
+    def _count(self, event: str):
+        self.counters[event] += 1
+        GATEWAY_EVENTS.inc(event)
+
+    def _delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_cap, self.backoff * 2**attempt))
+
+    async def _enter(self, priority: int):
+        started = time.perf_counter()
+        await self.gate.acquire(priority)
+        try:
+            await self.bucket.acquire()
+        except BaseException:
+            self.gate.release()
+            raise
+        STAGE_SECONDS.observe(time.perf_counter() - started, "gateway", "queue")
+
+    def _enter_sync(self, priority: int):
+        started = time.perf_counter()
+        self.gate.acquire_sync(priority)
+        try:
+            self.bucket.acquire_sync()
+        except BaseException:
+            self.gate.release()
+            raise
+        STAGE_SECONDS.observe(time.perf_counter() - started, "gateway", "queue")
+
+    def _give_up(self, error: Exception, attempt: int) -> bool:
+        if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+            self._count("timeouts")
+        if attempt >= self.max_retries or not is_retryable(error):
+            self._count("failures")
+            return True
+        self._count("retries")
+        return False
+
+    async def _call(self, priority: int, call):
+        for attempt in range(self.max_retries + 1):
+            await self._enter(priority)
+            try:
+                return await asyncio.wait_for(call(), self.timeout)
+            except Exception as e:
+                if self._give_up(e, attempt):
+                    raise
+            finally:
+                self.gate.release()
+            # Back off without holding a slot
+            await asyncio.sleep(self._delay(attempt))
+
+    async def agenerate(self, key: str, priority: int, call):
+        """Run ``call()`` (a coroutine factory), sharing it with identical
+        in-flight calls that have the same ``key``."""
+        self._count("calls")
+        task = self._inflight.get(key)
+        if task is not None:
+            self._count("coalesced")
+        else:
+            task = asyncio.ensure_future(self._call(priority, call))
+            self._inflight[key] = task
+
+            def done(t):
+                self._inflight.pop(key, None)
+                if not t.cancelled():
+                    t.exception()  # retrieved, so a failure nobody awaits isn't logged
+
+            task.add_done_callback(done)
+        # One caller giving up must not cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def astream(self, priority: int, stream):
+        """Yield from ``stream()`` (an async iterator factory). Retries only
+        happen before the first chunk; each chunk must arrive within the timeout."""
+        self._count("calls")
+        for attempt in range(self.max_retries + 1):
+            await self._enter(priority)
+            started = False
+            iterator = None
+            try:
+                iterator = stream().__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(iterator.__anext__(), self.timeout)
+                    except StopAsyncIteration:
+                        return
+                    started = True
+                    yield chunk
+            except Exception as e:
+                if started or self._give_up(e, attempt):
+                    raise
+            finally:
+                self.gate.release()
+                if iterator is not None and hasattr(iterator, "aclose"):
+                    with contextlib.suppress(Exception):
+                        await iterator.aclose()
+            await asyncio.sleep(self._delay(attempt))
+
+    def generate(self, priority: int, call):
+        """Blocking :meth:`agenerate` for sync callers on worker threads: same
+        gate, rate limit, timeout and retries, but no coalescing."""
+        self._count("calls")
+        for attempt in range(self.max_retries + 1):
+            self._enter_sync(priority)
+            try:
+                with contextlib.closing(
+                    _threaded(lambda: [call()], self.timeout)
+                ) as results:
+                    return next(results)
+            except Exception as e:
+                if self._give_up(e, attempt):
+                    raise
+            finally:
+                self.gate.release()
+            time.sleep(self._delay(attempt))
+
+    def stream(self, priority: int, stream):
+        """Blocking :meth:`astream`: yield from ``stream()`` (an iterator
+        factory) under the same gate, rate limit, timeout and retries."""
+        self._count("calls")
+        for attempt in range(self.max_retries + 1):
+            self._enter_sync(priority)
+            started = False
+            chunks = _threaded(stream, self.timeout)
+            try:
+                for chunk in chunks:
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if started or self._give_up(e, attempt):
+                    raise
+            finally:
+                self.gate.release()
+                chunks.close()
+            time.sleep(self._delay(attempt))
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "active": self.gate.active,
+            "queued": self.gate.waiting,
+            "inflight_prompts": len(self._inflight),
+        }
+
+
+def _prompt_key(llm, messages: List[BaseMessage], stop, kwargs) -> str:
+    payload = json.dumps(
+        [id(llm), [(m.type, m.content) for m in messages], stop, kwargs],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GatewayChatModel(BaseChatModel):
+    """A chat model whose calls go through an :class:`LLMGateway`.
+
+    Pass ``config={"metadata": {"llm_priority": ...}}`` to a chain to change
+    the priority of a single call.
+    """
+
+    underlying: Any
+    gateway: Any
+    priority: int = PRIORITY_NORMAL
+
+    @property
+    def _llm_type(self) -> str:
+        return f"gateway-{self.underlying._llm_type}"
+
+    def _priority(self, run_manager) -> int:
+        metadata = getattr(run_manager, "metadata", None) or {}
+        return metadata.get("llm_priority", self.priority)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return self.gateway.generate(
+            self._priority(run_manager),
+            lambda: self.underlying._generate(messages, stop=stop, **kwargs),
+        )
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return await self.gateway.agenerate(
+            _prompt_key(self.underlying, messages, stop, kwargs),
+            self._priority(run_manager),
+            lambda: self.underlying._agenerate(messages, stop=stop, **kwargs),
+        )
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        chunks = self.gateway.stream(
+            self._priority(run_manager),
+            lambda: self.underlying._stream(messages, stop=stop, **kwargs),
+        )
+        for chunk in chunks:
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        chunks = self.gateway.astream(
+            self._priority(run_manager),
+            lambda: self.underlying._astream(messages, stop=stop, **kwargs),
+        )
+        async for chunk in chunks:
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    """The process-wide gateway every agent and chain shares."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
+
+
+def default_chat_model(model: str = "gemini-1.5-flash-latest", temperature: float = 0.2):
+    """A Gemini chat model that leaves retrying to the gateway."""
+    return ChatGoogleGenerativeAI(model=model, temperature=temperature, max_retries=1)
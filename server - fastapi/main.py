@@ -1,16 +1,32 @@
-from fastapi import FastAPI, Body
+from fastapi import FastAPI, Body, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
 
-from chatbot import get_response, convert_history, ChatRequest
+from chatbot import get_response, stream_response, convert_history, ChatRequest
+from chatbot import file_paths as guide_files, knowledge_base, reload_guides
+from chatbot import summarize_history, instant_reply
+from chat_sessions import SessionStore, trim_history
 from job_agent import JobRecommenderAgent
 from proposal_agent import CoverLetterAgent
 from mcq_agent import McqAgent
 from user_recommender_agent import UserRecommenderAgent
 from rate_benchmark_agent import RateBenchmarkAgent
+from match_table import MatchTable
+from streaming import sse_event, ndjson_event
+from embedding_store import get_embedding
+from response_cache import SemanticCache
+from mcq_pool import McqPool, parse_skill_sets
+from agent_registry import AgentRegistry
+from dataset_watcher import DatasetWatcher, ReloadDeferred
+from llm_gateway import get_gateway, default_chat_model
+from job_filters import parse_job_filters, parse_page
+import metrics
+from pathlib import Path
+import asyncio
+import os
+import time
 
 load_dotenv()
 
@@ -26,35 +42,328 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+# ---------- Metrics ----------
+@app.middleware("http")
+async def record_request_time(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template, not raw path, to keep the series count bounded
+    route = request.scope.get("route")
+    metrics.HTTP_SECONDS.observe(
+        time.perf_counter() - started,
+        request.method,
+        getattr(route, "path", "unmatched"),
+        str(response.status_code),
+    )
+    return response
+
 # ---------- LLM + Agents ----------
-llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0.2)
+# Each agent bounds its own in-flight LLM calls: <AGENT>_CONCURRENCY, e.g.
+# JOB_AGENT_CONCURRENCY=4, falling back to AGENT_CONCURRENCY (default 8).
+llm = default_chat_model("gemini-1.5-flash", temperature=0.2)
+
+BASE_DIR = Path(__file__).resolve().parent
+JOBS_FILE = BASE_DIR / "jobs_dataset.json"
+USERS_FILE = BASE_DIR / "users_dataset.json"
+
+# Agents are built lazily (first request or background warmup), so the port
+# comes up immediately and one broken dataset only disables its own agent.
+agents = AgentRegistry()
+agents.register("chatbot", knowledge_base)
+agents.register("job", lambda: JobRecommenderAgent(llm=llm, data_file=JOBS_FILE))
+agents.register("proposal", lambda: CoverLetterAgent(llm=llm, data_file=JOBS_FILE))
+agents.register("rate", lambda: RateBenchmarkAgent(llm=llm, data_file=JOBS_FILE))
+agents.register("mcq", lambda: McqAgent(llm=llm))
+agents.register("user", lambda: UserRecommenderAgent(llm=llm, data_file=USERS_FILE))
+# Not an agent, but built and reloaded the same way: top candidates per open
+# job, ranked without the LLM (MATCH_TABLE_SIZE per job)
+agents.register("matches", lambda: MatchTable(JOBS_FILE, USERS_FILE))
+
+
+async def get_agent(name: str):
+    try:
+        return await agents.aget(name)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"{name} agent unavailable: {e}")
+
+
+# ---------- Dataset hot reload ----------
+# Polls every DATASET_WATCH_INTERVAL seconds (0 disables); POST /reload forces it
+watcher = DatasetWatcher(interval=float(os.getenv("DATASET_WATCH_INTERVAL", "5")))
+
+
+def reload_agents(*names):
+    def reload():
+        # An agent mid-build may have read the old file already; retry the
+        # reload on the next check instead of marking the change as applied
+        loading = [name for name in names if agents[name].state == "loading"]
+        if loading:
+            raise ReloadDeferred(f"still building: {', '.join(loading)}")
+        # Agents that are not built yet will read the new file when they are
+        return {
+            name: agents[name].instance.reload()
+            for name in names
+            if agents[name].instance is not None
+        }
 
-job_agent = JobRecommenderAgent(llm=llm, data_file="jobs_dataset.json")
-proposal_agent = CoverLetterAgent(llm=llm, data_file="jobs_dataset.json")
-rate_agent = RateBenchmarkAgent(llm=llm)
-mcq_agent = McqAgent(llm=llm)
-user_agent = UserRecommenderAgent(llm=llm, data_file="users_dataset.json")
+    return reload
+
+
+# ---------- Response caches ----------
+# Paraphrase-aware; RESPONSE_CACHE_THRESHOLD / _TTL / _SIZE tune all of them.
+# Each is invalidated once its dataset has been reloaded (not when the file
+# changes: until then requests are still answered from the old data).
+chat_cache = SemanticCache("chat", get_embedding())
+job_cache = SemanticCache("recommend", get_embedding())
+user_cache = SemanticCache("recommend-users", get_embedding())
+
+watcher.watch(
+    "jobs",
+    [JOBS_FILE],
+    reload_agents("job", "rate", "proposal", "matches"),
+    on_reload=[job_cache.invalidate],
+)
+watcher.watch(
+    "users",
+    [USERS_FILE],
+    reload_agents("user", "matches"),
+    on_reload=[user_cache.invalidate],
+)
+watcher.watch("guides", guide_files, reload_guides, on_reload=[chat_cache.invalidate])
+
+# Pre-generated MCQ sets for popular skill combinations
+mcq_pool = McqPool(lambda: get_agent("mcq"))
+
+
+# Server-side chat history: a window of recent turns plus a rolling summary,
+# capped at CHAT_HISTORY_TOKENS (see chat_sessions.py for the other knobs)
+chat_sessions = SessionStore(summarize=summarize_history)
 
 
 # ---------- Endpoints ----------
-@app.post("/chat")
-async def chat_endpoint(req: ChatRequest):
-    user_msg = req.message.strip()
-    hist_msgs = convert_history(req.history)
+async def answer(user_msg: str, hist_msgs: list) -> str:
+    # Greetings and FAQ hits are answered locally; no need to embed them for the cache
+    instant = instant_reply(user_msg)
+    if instant:
+        return instant[1]
+
+    # Answers depend on the conversation, so only fresh conversations are cached
+    use_cache = not hist_msgs
+    generation = chat_cache.generation
+    if use_cache:
+        cached = await chat_cache.aget(user_msg)
+        if cached is not None:
+            return cached
+
     reply = await get_response(user_msg, hist_msgs)
     if not isinstance(reply, str):
         reply = str(reply)
-    return JSONResponse(content={"reply": reply})
+    if use_cache and reply:
+        await chat_cache.aset(user_msg, reply, generation)
+    return reply
+
+
+@app.post("/chat")
+async def chat_endpoint(req: ChatRequest):
+    user_msg = req.message.strip()
+
+    # Older clients send the whole history every turn; keep it within budget
+    if req.history:
+        reply = await answer(user_msg, trim_history(convert_history(req.history)))
+        return JSONResponse(content={"reply": reply})
+
+    session = chat_sessions.get_or_create(req.session_id)
+    # One turn at a time per session, so replies land in order
+    async with session.lock:
+        reply = await answer(user_msg, session.history())
+        chat_sessions.record(session, user_msg, reply)
+    return JSONResponse(content={"reply": reply, "session_id": session.id})
+
+
+def event_stream(request: Request, events):
+    """Stream (event, data) pairs as SSE, or as NDJSON lines when the client
+    sends ``Accept: application/x-ndjson``."""
+    if "application/x-ndjson" in request.headers.get("accept", ""):
+        encode, media_type = ndjson_event, "application/x-ndjson"
+    else:
+        encode, media_type = sse_event, "text/event-stream"
+
+    async def body():
+        async for event, data in events:
+            yield encode(event, data)
+
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def session_stream(session, user_msg: str):
+    async with session.lock:
+        yield "session", {"session_id": session.id}
+        parts = []
+        async for event, data in stream_response(user_msg, session.history()):
+            if event == "token":
+                parts.append(data["text"])
+            elif event == "done":
+                # Before "done" goes out: the client may hang up right after it
+                chat_sessions.record(session, user_msg, "".join(parts))
+            yield event, data
+
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(req: ChatRequest, request: Request):
+    user_msg = req.message.strip()
+    if req.history:
+        hist_msgs = trim_history(convert_history(req.history))
+        return event_stream(request, stream_response(user_msg, hist_msgs))
+
+    session = chat_sessions.get_or_create(req.session_id)
+    return event_stream(request, session_stream(session, user_msg))
+
+
+@app.get("/chat/sessions/{session_id}")
+async def chat_session_status(session_id: str):
+    session = chat_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired session")
+    return session.status()
+
+
+@app.delete("/chat/sessions/{session_id}")
+async def delete_chat_session(session_id: str):
+    return {"deleted": chat_sessions.delete(session_id)}
 
 
 # ----- Jobs -----
+def job_search_options(data: dict):
+    """``(filters, page, page_size)`` for /recommend(/stream), or None when the
+    request is a plain query. Raises ValueError on malformed values."""
+    filters = parse_job_filters(data)
+    page, page_size = parse_page(data)
+    if not filters and "page" not in data and "page_size" not in data:
+        return None
+    return filters, page, page_size
+
+
 @app.post("/recommend")
 async def recommend_endpoint(data: dict = Body(...)):
+    # Optional filters: status, budget_min/budget_max, required_skills,
+    # optional_skills; paging with page/page_size (see job_filters.py)
+    query = data.get("query", "").strip()
+    if not query:
+        return {"error": "Query is required"}
+    try:
+        options = job_search_options(data)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    # The cache is keyed by query text only, so filtered/paged requests skip it
+    if options is not None:
+        job_agent = await get_agent("job")
+        filters, page, page_size = options
+        reply = await job_agent.arecommend(query, filters, page, page_size)
+        return {
+            "jobs": reply.get("jobs", []),
+            "page": page,
+            "page_size": page_size,
+            "total": reply.get("total", 0),
+        }
+
+    generation = job_cache.generation
+    cached = await job_cache.aget(query)
+    if cached is not None:
+        return {"jobs": cached}
+
+    job_agent = await get_agent("job")
+    reply = await job_agent.arecommend(query)
+    jobs = reply.get("jobs", [])
+    if jobs:
+        await job_cache.aset(query, jobs, generation)
+    return {"jobs": jobs}
+
+
+async def cached_stream(cache, query: str, key: str, events):
+    """Replay ``events`` (one ``key`` event per item, then ``done``), storing
+    the items in ``cache`` once the stream completes without error (and no
+    reload invalidated the cache meanwhile)."""
+    generation = cache.generation
+    items = []
+    async for event, data in events:
+        if event == key:
+            items.append(data)
+        yield event, data
+        if event == "done" and items:
+            await cache.aset(query, items, generation)
+
+
+async def replay_cached(items: list, key: str):
+    for item in items:
+        yield key, item
+    yield "done", {"count": len(items), "cached": True}
+
+
+@app.post("/recommend/stream")
+async def recommend_stream_endpoint(request: Request, data: dict = Body(...)):
+    # One "job" event per posting as soon as the model has written it
     query = data.get("query", "").strip()
     if not query:
         return {"error": "Query is required"}
-    reply = job_agent.recommend(query)
-    return {"jobs": reply.get("jobs", [])}
+    try:
+        options = job_search_options(data)
+    except ValueError as e:
+        return {"error": str(e)}
+    if options is not None:
+        job_agent = await get_agent("job")
+        return event_stream(request, job_agent.astream_recommend(query, *options))
+
+    cached = await job_cache.aget(query)
+    if cached is not None:
+        return event_stream(request, replay_cached(cached, "job"))
+
+    job_agent = await get_agent("job")
+    events = job_agent.astream_recommend(query)
+    return event_stream(request, cached_stream(job_cache, query, "job", events))
+
+
+MAX_BATCH_ITEMS = int(os.getenv("MAX_BATCH_ITEMS", "1000"))
+
+
+def batch_item(query: str, reply: dict, key: str):
+    if key in reply:
+        return {"query": query, key: reply[key]}
+    if "text" in reply:
+        return {"query": query, "error": "Failed to parse model reply"}
+    return {"query": query, "error": reply.get("error", "Unknown error")}
+
+
+@app.post("/recommend/batch")
+async def recommend_batch_endpoint(data: dict = Body(...)):
+    queries = data.get("queries", [])
+    if not isinstance(queries, list):
+        return {"error": "queries must be a list"}
+    if not queries:
+        return {"error": "queries is required"}
+    if len(queries) > MAX_BATCH_ITEMS:
+        return {"error": f"At most {MAX_BATCH_ITEMS} queries per batch"}
+    queries = [q.strip() if isinstance(q, str) else q for q in queries]
+
+    results = [None] * len(queries)
+    todo = []
+    for i, query in enumerate(queries):
+        if not isinstance(query, str) or not query:
+            results[i] = {"query": query, "error": "Query is required"}
+        else:
+            todo.append(i)
+
+    if todo:
+        job_agent = await get_agent("job")
+        replies = await job_agent.arecommend_batch([queries[i] for i in todo])
+        for i, reply in zip(todo, replies):
+            results[i] = batch_item(queries[i], reply, "jobs")
+    return {"results": results}
 
 
 from fastapi import FastAPI, Body
@@ -70,22 +379,86 @@ async def generate_proposal(data: dict = Body(...)):
     client_name = data.get("client_name", "")
     client_company = data.get("client_company", "")
 
+    proposal_agent = await get_agent("proposal")
+
+    # A known "job_id" fills in the title and description from the dataset
+    job = proposal_agent.get_job(str(data.get("job_id", "")))
+    if job is not None:
+        job_title = job_title or job.get("title", "")
+        description = description or job.get("description", "")
+
     if not job_title or not skills:
         return {"error": "job_title and skills are required"}
 
-    # You can modify your proposal_agent to accept all these details if needed
-    reply = proposal_agent.generate_cover_letter(
-        job_title, skills, name, email, description, client_name, client_company
+    reply = await proposal_agent.agenerate_cover_letter(
+        name=name,
+        email=email,
+        skills=skills,
+        job_title=job_title,
+        description=description,
+        client_name=client_name,
+        client_company=client_company,
     )
     return {"cover_letter": reply}
 
 
+MAX_BULK_PROPOSALS = int(os.getenv("MAX_BULK_PROPOSALS", "25"))
+
+
+@app.post("/generate-proposals")
+async def generate_proposals(request: Request, data: dict = Body(...)):
+    # One candidate, many job IDs; a "letter" event per job as each one finishes
+    job_ids = data.get("job_ids", [])
+    if not isinstance(job_ids, list):
+        raise HTTPException(status_code=422, detail="job_ids must be a list")
+    job_ids = [str(j) for j in job_ids]
+    skills = data.get("skills", [])
+    if not job_ids or not skills:
+        return {"error": "job_ids and skills are required"}
+    if len(job_ids) > MAX_BULK_PROPOSALS:
+        return {"error": f"At most {MAX_BULK_PROPOSALS} jobs per request"}
+
+    candidate = {"name": data.get("name", ""), "email": data.get("email", ""), "skills": skills}
+    proposal_agent = await get_agent("proposal")
+    return event_stream(request, proposal_agent.agenerate_bulk(candidate, job_ids))
+
+
+@app.get("/jobs")
+async def list_jobs():
+    # IDs accepted by /generate-proposal(s)
+    proposal_agent = await get_agent("proposal")
+    return {
+        "jobs": [
+            {
+                "id": id,
+                "title": job.get("title", ""),
+                "budget": job.get("budget"),
+                "status": job.get("status", ""),
+                "skillsRequired": job.get("skillsRequired", []),
+            }
+            for id, job in proposal_agent.jobs_by_id.items()
+        ]
+    }
+
+
+@app.get("/jobs/{job_id}/candidates")
+async def job_candidates(job_id: str):
+    # Served from the precomputed match table; no retrieval or LLM call
+    table = await get_agent("matches")
+    candidates = table.candidates(job_id)
+    if candidates is None:
+        raise HTTPException(status_code=404, detail="Unknown or closed job")
+    return {"job_id": job_id, "candidates": candidates, "updated_at": table.updated_at}
+
+
 @app.post("/benchmark")
 async def benchmark_endpoint(data: dict = Body(...)):
     query = data.get("query", "").strip()
     if not query:
         return {"error": "Query is required"}
-    reply = rate_agent.benchmark(query)
+    explain = bool(data.get("explain", False))
+    rate_agent = await get_agent("rate")
+    reply = await rate_agent.abenchmark(query, explain=explain)
     return {"data": reply}  # 👈 instead of reply.get("benchmarks", [])
 
 
@@ -95,7 +468,7 @@ async def generate_mcqs(data: dict = Body(...)):
     skills = data.get("skills", [])
     if not skills:
         return {"error": "Skills are required"}
-    mcqs = mcq_agent.generate_mcqs(skills)
+    mcqs = await mcq_pool.get(skills)
     return {"questions": mcqs}
 
 
@@ -107,40 +480,12 @@ async def evaluate_mcqs(data: dict = Body(...)):
     if not questions or user_answers is None:
         return {"evaluation": {"score": 0, "details": [], "feedback": "Invalid input"}}
 
-    evaluation = mcq_agent.evaluate_mcqs(questions, user_answers)
-
-    # Normalize to compute simple score
-    results = []
-    correct_count = 0
-
-    if isinstance(evaluation, list):
-        for item in evaluation:
-            q = item.get("question", "")
-            ua = item.get("user_answer", "")
-            ca = item.get("correct_answer", "")
-            correct = item.get("is_correct", False)
-            fb = item.get("feedback", "")
-            if correct:
-                correct_count += 1
-            results.append(
-                {
-                    "question": q,
-                    "user_answer": ua,
-                    "correct_answer": ca,
-                    "is_correct": correct,
-                    "feedback": fb,
-                }
-            )
-    else:
-        return {
-            "evaluation": {
-                "score": 0,
-                "details": [],
-                "feedback": "Failed to parse evaluation",
-            }
-        }
+    # Graded locally; "explain": true adds LLM feedback for wrong answers only
+    explain = bool(data.get("explain", False))
+    mcq_agent = await get_agent("mcq")
+    results = await mcq_agent.aevaluate_mcqs(questions, user_answers, explain=explain)
 
-    score = correct_count if questions else 0
+    score = sum(1 for r in results if r["is_correct"])
     # No gate here—frontend will always show Stage 2 button
     return {"evaluation": {"score": score, "details": results}}
 
@@ -151,7 +496,8 @@ async def generate_descriptive(data: dict = Body(...)):
     skills = data.get("skills", [])
     if not skills:
         return {"error": "Skills are required"}
-    qs = mcq_agent.generate_descriptive(skills)
+    mcq_agent = await get_agent("mcq")
+    qs = await mcq_agent.agenerate_descriptive(skills)
     return {"questions": qs}
 
 
@@ -164,53 +510,252 @@ async def evaluate_descriptive(data: dict = Body(...)):
             "evaluation": {"total_score": 0, "details": [], "feedback": "Invalid input"}
         }
 
-    result = mcq_agent.evaluate_descriptive(questions, user_answers)
-
-    # Normalize if model returns list + final object
-    details = []
-    total = 0
-    if isinstance(result, list):
-        for item in result:
-            if isinstance(item, dict) and "total_score" in item:
-                total = item.get("total_score", total)
-            else:
-                details.append(
-                    {
-                        "question": item.get("question", ""),
-                        "user_answer": item.get("user_answer", ""),
-                        "score": item.get("score", 0),
-                        "feedback": item.get("feedback", ""),
-                    }
-                )
-        if not total:
-            total = sum(d.get("score", 0) for d in details)
-    elif isinstance(result, dict):
-        total = result.get("total_score", 0)
-        details = result.get("details", [])
-    else:
-        return {
-            "evaluation": {
-                "total_score": 0,
-                "details": [],
-                "feedback": "Failed to parse evaluation",
-            }
-        }
+    # Each answer is graded by its own concurrent call; the total is summed here
+    mcq_agent = await get_agent("mcq")
+    evaluation = await mcq_agent.aevaluate_descriptive(questions, user_answers)
+    return {"evaluation": evaluation}
+
+
+@app.post("/evaluate-descriptive/stream")
+async def evaluate_descriptive_stream(request: Request, data: dict = Body(...)):
+    # A "result" event per answer as soon as it is graded, then "done" with the total
+    questions = data.get("questions", [])
+    user_answers = data.get("user_answers", {})
+    if not questions or user_answers is None:
+        return {"error": "questions and user_answers are required"}
 
-    return {"evaluation": {"total_score": total, "details": details}}
+    mcq_agent = await get_agent("mcq")
+    return event_stream(
+        request, mcq_agent.astream_evaluate_descriptive(questions, user_answers)
+    )
 
 
 # ----- Users -----
+# Most candidates one /recommend-users request may ask for ("k")
+MAX_CANDIDATES = int(os.getenv("MAX_CANDIDATES", "50"))
+
+
+def candidate_count(data: dict) -> int:
+    """``k`` from a request body, capped at MAX_CANDIDATES. Raises ValueError."""
+    try:
+        k = int(data.get("k", 5))
+    except (TypeError, ValueError):
+        raise ValueError("k must be an integer") from None
+    if k < 1:
+        raise ValueError("k must be at least 1")
+    return min(k, MAX_CANDIDATES)
+
+
+def target_rate(data: dict):
+    """Hourly ``rate`` from a request body, or None. Raises ValueError."""
+    rate = data.get("rate")
+    if rate is None or rate == "":
+        return None
+    try:
+        return float(rate)
+    except (TypeError, ValueError):
+        raise ValueError("rate must be a number") from None
+
+
+def parse_skills(value) -> list[str]:
+    """Skills from a list or a comma-separated string. Raises ValueError."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    elif not isinstance(value, list):
+        raise ValueError("skills must be a list of strings")
+    if not all(isinstance(s, str) for s in value):
+        raise ValueError("skills must be a list of strings")
+    return [s.strip() for s in value if s.strip()]
+
+
+def request_skills(data: dict) -> list[str]:
+    try:
+        return parse_skills(data.get("skills"))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
 @app.post("/recommend-users")
 async def recommend_users(data: dict = Body(...)):
     query = data.get("query", "").strip()
-    if not query:
+    skills = request_skills(data)
+    if not query and not skills:
         return {"error": "Query is required"}
-    reply = user_agent.recommend(query)
-    return {"users": reply.get("users", [])}
+
+    try:
+        rate = target_rate(data)
+        k = candidate_count(data)
+    except ValueError as e:
+        return {"error": str(e)}
+    explain = bool(data.get("explain", False))
+
+    user_agent = await get_agent("user")
+
+    # Queries naming known skills are ranked locally (exact, no LLM needed)
+    if skills or user_agent.ranker.extract_skills(query):
+        reply = await user_agent.arecommend(
+            query,
+            skills=skills,
+            target_rate=rate,
+            explain=explain,
+            k=k,
+        )
+        return {"users": reply.get("users", [])}
+
+    generation = user_cache.generation
+    cached = await user_cache.aget(query)
+    if cached is not None:
+        return {"users": cached}
+
+    reply = await user_agent.arecommend(query)
+    users = reply.get("users", [])
+    if users:
+        await user_cache.aset(query, users, generation)
+    return {"users": users}
+
+
+@app.post("/recommend-users/stream")
+async def recommend_users_stream(request: Request, data: dict = Body(...)):
+    # Same routing as /recommend-users, one "user" event per candidate
+    query = data.get("query", "").strip()
+    skills = request_skills(data)
+    if not query and not skills:
+        return {"error": "Query is required"}
+
+    try:
+        rate = target_rate(data)
+        k = candidate_count(data)
+    except ValueError as e:
+        return {"error": str(e)}
+    explain = bool(data.get("explain", False))
+
+    user_agent = await get_agent("user")
+
+    if skills or user_agent.ranker.extract_skills(query):
+        events = user_agent.astream_recommend(
+            query,
+            skills=skills,
+            target_rate=rate,
+            explain=explain,
+            k=k,
+        )
+        return event_stream(request, events)
+
+    cached = await user_cache.aget(query)
+    if cached is not None:
+        return event_stream(request, replay_cached(cached, "user"))
+
+    events = user_agent.astream_recommend(query)
+    return event_stream(request, cached_stream(user_cache, query, "user", events))
+
+
+@app.post("/recommend-users/batch")
+async def recommend_users_batch(data: dict = Body(...)):
+    # Each item is a query string or {"query", "skills", "rate"}
+    try:
+        k = candidate_count(data)
+    except ValueError as e:
+        return {"error": str(e)}
+    queries = data.get("queries", [])
+    if not isinstance(queries, list):
+        return {"error": "queries must be a list"}
+    if not queries:
+        return {"error": "queries is required"}
+    if len(queries) > MAX_BATCH_ITEMS:
+        return {"error": f"At most {MAX_BATCH_ITEMS} queries per batch"}
+
+    results = [None] * len(queries)
+    items, todo = [], []
+    for i, item in enumerate(queries):
+        if isinstance(item, str):
+            item = {"query": item}
+        elif isinstance(item, dict):
+            item = dict(item)
+        else:
+            results[i] = {"query": item, "error": "Query is required"}
+            continue
+        item["query"] = str(item.get("query") or "").strip()
+        try:
+            item["skills"] = parse_skills(item.get("skills"))
+            item["rate"] = target_rate(item)
+        except ValueError as e:
+            results[i] = {"query": item["query"], "error": str(e)}
+            continue
+        if not item["query"] and not item["skills"]:
+            results[i] = {"query": item["query"], "error": "Query is required"}
+            continue
+        items.append(item)
+        todo.append(i)
+
+    if items:
+        user_agent = await get_agent("user")
+        replies = await user_agent.arecommend_batch(
+            items, explain=bool(data.get("explain", False)), k=k
+        )
+        for i, item, reply in zip(todo, items, replies):
+            results[i] = batch_item(item["query"], reply, "users")
+    return {"results": results}
+
+
+# ----- Ops -----
+@app.post("/reload")
+async def reload_datasets():
+    return {"reloaded": await watcher.check(force=True)}
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        **{c.name: c.stats() for c in (chat_cache, job_cache, user_cache)},
+        "mcq_pool": mcq_pool.stats(),
+        "chat_sessions": chat_sessions.stats(),
+        "llm_gateway": get_gateway().stats(),
+        "match_table": (
+            agents["matches"].instance.stats()
+            if agents["matches"].instance is not None
+            else None
+        ),
+    }
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    # Prometheus text format; per-stage timings, LLM sizes, routes, parse failures
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/ready")
+async def ready():
+    status = {"ready": agents.ready, "agents": agents.status()}
+    return JSONResponse(content=status, status_code=200 if agents.ready else 503)
+
+
+background_tasks = set()
+
+
+@app.on_event("startup")
+async def warmup():
+    # AGENT_WARMUP=0 leaves every agent to be built by its first request
+    if os.getenv("AGENT_WARMUP", "1") != "0":
+        task = asyncio.create_task(agents.warmup())
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+    watcher.start()
+
+    # e.g. MCQ_POOL_WARM_SKILLS="Python,Django;React,JavaScript"
+    mcq_pool.warm(parse_skill_sets(os.getenv("MCQ_POOL_WARM_SKILLS", "")))
 
 
 # ---------- Run ----------
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=5000)
+    # Several workers need the app as an import string; with VECTOR_BACKEND=mmap
+    # they share one copy of every vector index
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    uvicorn.run(
+        "main:app" if workers > 1 else app, host="0.0.0.0", port=5000, workers=workers
+    )
@@ -0,0 +1,142 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+from candidate_ranking import CandidateRanker, candidate_card
+from dataset_loader import load_records, job_id, user_id
+from metrics import timed
+
+load_dotenv()
+
+# Candidates kept per open job
+MATCH_TABLE_SIZE = int(os.getenv("MATCH_TABLE_SIZE", "10"))
+
+
+def _fingerprint(record: dict) -> str:
+    payload = json.dumps(record, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _skills(record: dict, field: str) -> set:
+    return {s.lower() for s in record.get(field) or []}
+
+
+class MatchTable:
+    """Top candidates for every open job, precomputed with CandidateRanker.
+
+    The table maps a job ID to a tuple of user IDs, best first, so serving a
+    job's candidates is a dict lookup plus building the cards. ``reload``
+    re-reads both datasets and only re-ranks what an edit can have changed:
+    new or edited jobs, and jobs sharing a skill with an added, edited or
+    removed user (a user can only be a candidate for a job they share a
+    skill with).
+
+    Ranking uses the job's required skills, then stars; job budgets are per
+    project, not hourly, so no target rate is used.
+    """
+
+    def __init__(self, jobs_file, users_file, size: int = MATCH_TABLE_SIZE):
+        self.jobs_file = Path(jobs_file)
+        self.users_file = Path(users_file)
+        self.size = size
+        self._lock = threading.Lock()
+
+        # (open job ID -> record, user ID -> record, open job ID -> (user ID,
+        # ...)) swapped in one assignment, so readers never mix two updates
+        self._data = ({}, {}, {})
+        self._job_prints = {}
+        self._user_prints = {}
+        self.ranker = CandidateRanker([])
+        self.user_ids = []
+        self.updated_at = None
+        self.last_update = {}
+
+        self.reload()
+
+    def __len__(self):
+        return len(self._data[2])
+
+    def reload(self) -> dict:
+        """Re-read both datasets and re-rank the jobs an edit can affect."""
+        jobs = load_records(self.jobs_file)
+        users = load_records(self.users_file)
+        with self._lock:
+            return self._update(jobs, users)
+
+    def _update(self, jobs: list[dict], users: list[dict]) -> dict:
+        _, old_users, old_table = self._data
+        user_prints = {user_id(u): _fingerprint(u) for u in users}
+        changed_users = {
+            uid
+            for uid in user_prints.keys() | self._user_prints.keys()
+            if user_prints.get(uid) != self._user_prints.get(uid)
+        }
+        new_users = {user_id(u): u for u in users}
+        # Skills before and after the edit: both sides' jobs may rank differently
+        touched_skills = set()
+        for uid in changed_users:
+            for side in (old_users, new_users):
+                if uid in side:
+                    touched_skills |= _skills(side[uid], "skills")
+        if changed_users:
+            self.ranker = CandidateRanker(users)
+            self.user_ids = [user_id(u) for u in users]
+
+        open_jobs = {
+            job_id(j): j for j in jobs if str(j.get("status", "")).lower() == "open"
+        }
+        job_prints = {jid: _fingerprint(j) for jid, j in open_jobs.items()}
+        stale = {
+            jid
+            for jid, fingerprint in job_prints.items()
+            if self._job_prints.get(jid) != fingerprint
+            or _skills(open_jobs[jid], "skillsRequired") & touched_skills
+        }
+
+        with timed("matches", "rank"):
+            table = {jid: old_table[jid] for jid in open_jobs if jid not in stale}
+            for jid in stale:
+                skills = open_jobs[jid].get("skillsRequired") or []
+                ranked = self.ranker.rank(skills, k=self.size)
+                table[jid] = tuple(self.user_ids[row] for row, _ in ranked)
+
+        removed = len(old_table.keys() - open_jobs.keys())
+        self._data = (open_jobs, new_users, table)
+        self._job_prints, self._user_prints = job_prints, user_prints
+        self.updated_at = time.time()
+        self.last_update = {
+            "recomputed": len(stale),
+            "removed": removed,
+            "users_changed": len(changed_users),
+            "jobs": len(table),
+        }
+        return self.last_update
+
+    def candidates(self, jid: str):
+        """Candidate cards for open job ``jid``, best first; None if unknown."""
+        jobs, users, table = self._data
+        user_ids = table.get(jid)
+        if user_ids is None:
+            return None
+        wanted = _skills(jobs[jid], "skillsRequired")
+        cards = []
+        for uid in user_ids:
+            user = users[uid]
+            card = candidate_card(user)
+            card["matched_skills"] = [
+                s for s in user.get("skills", []) if s.lower() in wanted
+            ]
+            cards.append(card)
+        return cards
+
+    def stats(self) -> dict:
+        return {
+            "jobs": len(self),
+            "size": self.size,
+            "updated_at": self.updated_at,
+            "last_update": self.last_update,
+        }
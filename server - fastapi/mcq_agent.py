@@ -1,20 +1,26 @@
+import asyncio
 import json
 import os
 from dotenv import load_dotenv
 
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import SystemMessage
 from langchain_core.output_parsers import StrOutputParser
 
+from agent_concurrency import make_limiter
+from llm_gateway import get_gateway, default_chat_model, PRIORITY_NORMAL
+from metrics import timed, with_metrics, PARSE_FAILURES
+
 load_dotenv()
 
 
 class McqAgent:
-    def __init__(self, llm=None):
+    def __init__(self, llm=None, max_concurrency=None):
+        self.limiter = make_limiter("mcq_agent", max_concurrency)
         # You can pass an LLM from main.py; otherwise we create a default one
-        self.llm = llm or ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash", temperature=0.7
+        self.llm = get_gateway().wrap(
+            llm or default_chat_model("gemini-1.5-flash", temperature=0.7),
+            PRIORITY_NORMAL,
         )
         parser = StrOutputParser()
 
@@ -49,29 +55,27 @@ Format:
                 ("human", "User skills: {skills}"),
             ]
         )
-        self.mcq_chain = self.mcq_prompt | self.llm | parser
+        self.mcq_chain = with_metrics(self.mcq_prompt | self.llm | parser, "mcq")
 
-        self.eval_prompt = ChatPromptTemplate.from_messages(
+        # Grading is done locally; the LLM only explains wrong answers on request
+        self.feedback_prompt = ChatPromptTemplate.from_messages(
             [
                 SystemMessage(
-                    content="""You are an AI evaluator. 
-Compare the user's selected options with the correct options.
-Return **valid JSON** list:
+                    content="""You are an AI Interview Coach.
+For each question the user answered incorrectly, explain briefly (1-2 sentences) why the correct option is right.
+Return **valid JSON** list, one object per question, in the same order:
 
 [
   {
-    "question": "string",
-    "user_answer": "A/B/C/D",
-    "correct_answer": "A/B/C/D",
-    "is_correct": true/false,
+    "index": number,
     "feedback": "short explanation"
   }
 ]"""
                 ),
-                ("human", "Questions: {qa_pairs}\n\nUser Answers: {user_answers}"),
+                ("human", "Incorrect answers: {wrong_answers}"),
             ]
         )
-        self.eval_chain = self.eval_prompt | self.llm | parser
+        self.feedback_chain = with_metrics(self.feedback_prompt | self.llm | parser, "mcq")
 
         # -------- Stage 2 (Text / Coding) --------
         self.desc_prompt = ChatPromptTemplate.from_messages(
@@ -99,76 +103,302 @@ Rules:
                 ("human", "User skills: {skills}"),
             ]
         )
-        self.desc_chain = self.desc_prompt | self.llm | parser
+        self.desc_chain = with_metrics(self.desc_prompt | self.llm | parser, "mcq")
 
-        self.desc_eval_prompt = ChatPromptTemplate.from_messages(
+        # One call per answer: grading takes as long as the slowest single
+        # answer, and a bad reply only costs that answer's score
+        self.desc_grade_prompt = ChatPromptTemplate.from_messages(
             [
                 SystemMessage(
                     content="""You are a strict but fair coding evaluator.
-Evaluate user **descriptive/coding answers** for correctness, clarity, edge cases, and complexity.
-BE STRICTER WITH THEM **JUDGING SHOULD BE TOUGH**                          
-
-Return **valid JSON** list of per-question results:
-[
-  {
-    "question": "string",
-    "user_answer": "string",
-    "score": 0-10,
-    "feedback": "short, constructive feedback"
-  }
-]
+Evaluate ONE user **descriptive/coding answer** for correctness, clarity, edge cases, and complexity.
+BE STRICTER WITH THEM **JUDGING SHOULD BE TOUGH**
 
-Then ALSO include a final object:
-{"total_score": number}  # sum of the 3 scores, max 30
+Return **valid JSON only**:
+{"score": 0-10, "feedback": "short, constructive feedback"}
 """
                 ),
-                ("human", "Questions: {questions}\n\nUser Answers: {user_answers}"),
+                ("human", "Question: {question}\n\nUser Answer: {user_answer}"),
             ]
         )
-        self.desc_eval_chain = self.desc_eval_prompt | self.llm | parser
+        self.desc_grade_chain = with_metrics(
+            self.desc_grade_prompt | self.llm | parser, "mcq"
+        )
 
     # -------- Stage 1 --------
+    def _mcq_input(self, skills: list[str], variant_id: int = None):
+        return {
+            "skills": ", ".join(skills),
+            "variant": str(variant_id or os.urandom(2).hex()),
+        }
+
     def generate_mcqs(self, skills: list[str], variant_id: int = None):
-        raw = self.mcq_chain.invoke(
-            {
-                "skills": ", ".join(skills),
-                "variant": str(variant_id or os.urandom(2).hex()),
-            }
-        )
+        raw = self.mcq_chain.invoke(self._mcq_input(skills, variant_id))
         return self._parse_json(raw)
 
-    def evaluate_mcqs(self, questions: list[dict], user_answers: dict):
-        raw = self.eval_chain.invoke(
+    async def agenerate_mcqs(
+        self, skills: list[str], variant_id: int = None, priority: int = None
+    ):
+        config = {"metadata": {"llm_priority": priority}} if priority is not None else None
+        async with self.limiter:
+            raw = await self.mcq_chain.ainvoke(
+                self._mcq_input(skills, variant_id), config=config
+            )
+        return self._parse_json(raw)
+
+    @staticmethod
+    def _letter_prefix(text: str) -> str:
+        """The letter of "B", "b)" or "B. ...", else ""."""
+        if text[:1].upper() in ("A", "B", "C", "D") and (
+            len(text) == 1 or text[1] in ")."
+        ):
+            return text[0].upper()
+        return ""
+
+    def _option_letter(self, answer, options: list) -> str:
+        """Map an answer to its option letter.
+
+        Checked in order: the full option string ("B) False"), a letter or
+        letter prefix ("B", "b) ..."), then the option text without its
+        prefix ("False"), so a text like "B-tree" or "A linked list" is only
+        read as a letter when it has a ")" or "." after the first character.
+        """
+        text = str(answer or "").strip()
+        if not text:
+            return ""
+        options = [str(o).strip() for o in (options or [])[:4]]
+        for i, option in enumerate(options):
+            if text == option:
+                return "ABCD"[i]
+        letter = self._letter_prefix(text)
+        if letter:
+            return letter
+        for i, option in enumerate(options):
+            if text == option[3:].strip():
+                return "ABCD"[i]
+        return ""
+
+    def _user_answer(self, user_answers: dict, index: int, question: dict):
+        # The frontend keys answers by question index; accept question text too
+        for key in (str(index), index, question.get("question")):
+            if key in user_answers:
+                return user_answers[key]
+        return ""
+
+    def grade_mcqs(self, questions: list[dict], user_answers: dict):
+        """Grade locally against ``correct_option``; O(n), no model call."""
+        results = []
+        for i, q in enumerate(questions):
+            options = q.get("options", [])
+            user_answer = self._option_letter(self._user_answer(user_answers, i, q), options)
+            # The answer key is always a letter; never match it against option texts
+            correct_answer = self._letter_prefix(str(q.get("correct_option") or "").strip())
+            is_correct = bool(user_answer) and user_answer == correct_answer
+            if is_correct:
+                feedback = "Correct!"
+            elif user_answer:
+                feedback = f"Incorrect. The correct answer is {correct_answer}."
+            else:
+                feedback = f"Not answered. The correct answer is {correct_answer}."
+            results.append(
+                {
+                    "question": q.get("question", ""),
+                    "user_answer": user_answer,
+                    "correct_answer": correct_answer,
+                    "is_correct": is_correct,
+                    "feedback": feedback,
+                }
+            )
+        return results
+
+    def _feedback_input(self, questions: list[dict], results: list[dict]):
+        wrong = [
             {
-                "qa_pairs": json.dumps(questions, indent=2),
-                "user_answers": json.dumps(user_answers, indent=2),
+                "index": i,
+                "question": r["question"],
+                "options": questions[i].get("options", []),
+                "user_answer": r["user_answer"],
+                "correct_answer": r["correct_answer"],
             }
-        )
-        return self._parse_json(raw)
+            for i, r in enumerate(results)
+            if not r["is_correct"]
+        ]
+        return {"wrong_answers": json.dumps(wrong, indent=2)} if wrong else None
+
+    def _apply_feedback(self, results: list[dict], raw: str):
+        feedback = self._parse_json(raw)
+        if not isinstance(feedback, list):
+            return results
+        for item in feedback:
+            if not isinstance(item, dict):
+                continue
+            index = item.get("index")
+            # Only annotate wrong answers; the score never comes from the model
+            if isinstance(index, int) and 0 <= index < len(results):
+                if not results[index]["is_correct"] and item.get("feedback"):
+                    results[index]["feedback"] = item["feedback"]
+        return results
+
+    def evaluate_mcqs(self, questions: list[dict], user_answers: dict, explain: bool = False):
+        with timed("mcq", "grade"):
+            results = self.grade_mcqs(questions, user_answers)
+        feedback_input = self._feedback_input(questions, results) if explain else None
+        if feedback_input:
+            try:
+                raw = self.feedback_chain.invoke(feedback_input)
+                results = self._apply_feedback(results, raw)
+            except Exception as e:
+                print(f"❌ MCQ feedback error: {e}, keeping short feedback")
+        return results
+
+    async def aevaluate_mcqs(
+        self, questions: list[dict], user_answers: dict, explain: bool = False
+    ):
+        with timed("mcq", "grade"):
+            results = self.grade_mcqs(questions, user_answers)
+        feedback_input = self._feedback_input(questions, results) if explain else None
+        if feedback_input:
+            try:
+                async with self.limiter:
+                    raw = await self.feedback_chain.ainvoke(feedback_input)
+                results = self._apply_feedback(results, raw)
+            except Exception as e:
+                print(f"❌ MCQ feedback error: {e}, keeping short feedback")
+        return results
 
     # -------- Stage 2 --------
     def generate_descriptive(self, skills: list[str]):
         raw = self.desc_chain.invoke({"skills": ", ".join(skills)})
         return self._parse_json(raw)
 
+    async def agenerate_descriptive(self, skills: list[str]):
+        async with self.limiter:
+            raw = await self.desc_chain.ainvoke({"skills": ", ".join(skills)})
+        return self._parse_json(raw)
+
+    def _desc_answers(self, questions: list[dict], user_answers: dict):
+        """(question text, answer text) per question, in order."""
+        pairs = []
+        for i, q in enumerate(questions):
+            text = q.get("question", "") if isinstance(q, dict) else str(q)
+            answer = self._user_answer(user_answers, i, q if isinstance(q, dict) else {})
+            pairs.append((text, str(answer or "").strip()))
+        return pairs
+
+    def _desc_result(self, index: int, question: str, answer: str, raw=None) -> dict:
+        """One graded answer; ``raw`` is the model reply, the exception raised,
+        or None for an empty answer (scored 0 without asking the model)."""
+        result = {
+            "index": index,
+            "question": question,
+            "user_answer": answer,
+            "score": 0,
+            "feedback": "",
+        }
+        if raw is None:
+            result["feedback"] = "No answer given."
+            return result
+        if isinstance(raw, Exception):
+            result["error"] = f"{type(raw).__name__}: {raw}"
+            return result
+
+        graded = self._parse_json(raw)
+        if isinstance(graded, list) and graded:
+            graded = graded[0]
+        try:
+            score = float(str(graded.get("score")).split("/")[0])
+        except (AttributeError, TypeError, ValueError):
+            result["error"] = "Failed to parse grade"
+            return result
+        score = min(10.0, max(0.0, score))
+        result["score"] = int(score) if score.is_integer() else score
+        result["feedback"] = str(graded.get("feedback", ""))
+        return result
+
+    def _desc_summary(self, results: list[dict]) -> dict:
+        # Scored here, not by the model, so it always adds up
+        failed = sum(1 for r in results if "error" in r)
+        return {
+            "total_score": sum(r["score"] for r in results),
+            "max_score": 10 * len(results),
+            "graded": len(results) - failed,
+            "failed": failed,
+        }
+
     def evaluate_descriptive(self, questions: list[dict], user_answers: dict):
-        raw = self.desc_eval_chain.invoke(
-            {
-                "questions": json.dumps(questions, indent=2),
-                "user_answers": json.dumps(user_answers, indent=2),
-            }
+        pairs = self._desc_answers(questions, user_answers)
+        todo = [i for i, (_, answer) in enumerate(pairs) if answer]
+        replies = self.desc_grade_chain.batch(
+            [{"question": pairs[i][0], "user_answer": pairs[i][1]} for i in todo],
+            return_exceptions=True,
         )
-        return self._parse_json(raw)
+        raw = dict(zip(todo, replies))
+        results = [
+            self._desc_result(i, q, a, raw.get(i)) for i, (q, a) in enumerate(pairs)
+        ]
+        return {**self._desc_summary(results), "details": results}
+
+    async def astream_evaluate_descriptive(
+        self, questions: list[dict], user_answers: dict
+    ):
+        """Grade every answer concurrently, yielding (event, data) pairs.
+
+        One ``result`` event per question as soon as its grade is in (a failed
+        one carries ``error`` and scores 0), then ``done`` with the total.
+        """
+        results = []
+
+        async def grade(index: int, question: str, answer: str):
+            try:
+                async with self.limiter:
+                    raw = await self.desc_grade_chain.ainvoke(
+                        {"question": question, "user_answer": answer}
+                    )
+            except Exception as e:
+                raw = e
+            return self._desc_result(index, question, answer, raw)
+
+        tasks = []
+        for i, (question, answer) in enumerate(self._desc_answers(questions, user_answers)):
+            if not answer:
+                # Nothing to grade; no need to ask the model
+                results.append(self._desc_result(i, question, answer))
+                yield "result", results[-1]
+            else:
+                tasks.append(asyncio.create_task(grade(i, question, answer)))
+
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                results.append(result)
+                yield "result", result
+        finally:
+            # The client went away: stop grading answers nobody will see
+            for task in tasks:
+                task.cancel()
+
+        yield "done", self._desc_summary(results)
+
+    async def aevaluate_descriptive(self, questions: list[dict], user_answers: dict):
+        results, summary = [], {}
+        async for event, data in self.astream_evaluate_descriptive(questions, user_answers):
+            if event == "result":
+                results.append(data)
+            else:
+                summary = data
+        return {**summary, "details": sorted(results, key=lambda r: r["index"])}
 
     # -------- Helper --------
     def _parse_json(self, raw_reply: str):
-        try:
-            text = raw_reply.strip()
-            if text.startswith("```"):
-                text = text.strip("`")
-                if text.lower().startswith("json"):
-                    text = text[4:]
-                text = text.strip()
-            return json.loads(text)
-        except Exception:
-            return {"error": "Failed to parse", "raw": raw_reply}
+        with timed("mcq", "parse"):
+            try:
+                text = raw_reply.strip()
+                if text.startswith("```"):
+                    text = text.strip("`")
+                    if text.lower().startswith("json"):
+                        text = text[4:]
+                    text = text.strip()
+                return json.loads(text)
+            except Exception:
+                PARSE_FAILURES.inc("mcq")
+                return {"error": "Failed to parse", "raw": raw_reply}
@@ -0,0 +1,163 @@
+from collections import Counter, OrderedDict, deque
+import asyncio
+import os
+from dotenv import load_dotenv
+
+from llm_gateway import PRIORITY_BACKGROUND
+
+load_dotenv()
+
+
+def skills_key(skills: list[str]) -> tuple:
+    return tuple(sorted({s.strip().lower() for s in skills if s and s.strip()}))
+
+
+def parse_skill_sets(value: str) -> list[list[str]]:
+    """Parse ``"Python,Django;React,JavaScript"`` into skill lists."""
+    return [
+        [s.strip() for s in group.split(",") if s.strip()]
+        for group in (value or "").split(";")
+        if group.strip()
+    ]
+
+
+def is_valid_question_set(questions, expected: int = 10) -> bool:
+    if not isinstance(questions, list) or len(questions) != expected:
+        return False
+    for q in questions:
+        if not isinstance(q, dict) or not q.get("question"):
+            return False
+        options = q.get("options")
+        if not isinstance(options, list) or len(options) != 4:
+            return False
+        if str(q.get("correct_option", "")).strip()[:1].upper() not in ("A", "B", "C", "D"):
+            return False
+    return True
+
+
+class McqPool:
+    """Pre-generated MCQ sets for popular skill combinations.
+
+    Once a skill set has been requested ``hot_after`` times it gets a pool that
+    is refilled in the background up to ``target`` sets whenever it drops below
+    ``low_water``. Each pooled set comes from its own generation (with its own
+    random variant) and is served once. Request counts are kept for the
+    ``max_tracked`` most recently requested skill sets only, so clients
+    sending endless distinct combinations cannot grow them without bound.
+    """
+
+    def __init__(
+        self,
+        get_agent,
+        low_water: int = int(os.getenv("MCQ_POOL_LOW_WATER", "2")),
+        target: int = int(os.getenv("MCQ_POOL_TARGET", "4")),
+        hot_after: int = int(os.getenv("MCQ_POOL_HOT_AFTER", "2")),
+        max_keys: int = int(os.getenv("MCQ_POOL_MAX_KEYS", "64")),
+        max_tracked: int = int(os.getenv("MCQ_POOL_MAX_TRACKED", "1024")),
+    ):
+        # Async callable returning the McqAgent, so the agent can be built lazily
+        self.get_agent = get_agent
+        self.low_water = low_water
+        self.target = max(target, low_water)
+        self.hot_after = hot_after
+        self.max_keys = max_keys
+        self.max_tracked = max_tracked
+
+        self.pools = {}
+        self.skill_names = {}
+        # key -> request count, least recently requested first
+        self.requests = OrderedDict()
+        self.counters = Counter()
+        self._refilling = set()
+        self._tasks = set()
+
+    def _is_hot(self, key) -> bool:
+        return key in self.pools or (
+            self.requests.get(key, 0) >= self.hot_after
+            and len(self.pools) < self.max_keys
+        )
+
+    def _schedule_refill(self, key):
+        if key in self._refilling or len(self.pools.get(key, ())) >= self.low_water:
+            return
+        self._refilling.add(key)
+        self.pools.setdefault(key, deque())
+        task = asyncio.create_task(self._refill(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refill(self, key):
+        pool = self.pools[key]
+        failures = 0
+        try:
+            while len(pool) < self.target and failures < 3:
+                try:
+                    agent = await self.get_agent()
+                    # Refills are speculative; never make a user wait behind them
+                    questions = await agent.agenerate_mcqs(
+                        self.skill_names[key], priority=PRIORITY_BACKGROUND
+                    )
+                except Exception as e:
+                    print(f"❌ MCQ pool refill error for {key}: {e}")
+                    questions = None
+                if is_valid_question_set(questions):
+                    pool.append(questions)
+                    self.counters["generated"] += 1
+                else:
+                    failures += 1
+                    self.counters["rejected"] += 1
+        finally:
+            self._refilling.discard(key)
+
+    def warm(self, skill_sets: list[list[str]]):
+        """Start filling pools for known-popular skill sets (needs a running loop).
+
+        Only the first sets that fit under ``max_keys`` are warmed.
+        """
+        for i, skills in enumerate(skill_sets):
+            key = skills_key(skills)
+            if not key:
+                continue
+            if key not in self.pools and len(self.pools) >= self.max_keys:
+                print(
+                    f"⚠️ MCQ pool is full ({self.max_keys} keys); "
+                    f"not warming {len(skill_sets) - i} more skill set(s)"
+                )
+                return
+            self.skill_names.setdefault(key, skills)
+            self._schedule_refill(key)
+
+    def _track(self, key, skills: list[str]):
+        """Count a request for ``key``, forgetting the least recent cold keys."""
+        self.skill_names.setdefault(key, skills)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        self.requests.move_to_end(key)
+        while len(self.requests) > self.max_tracked:
+            old, _ = self.requests.popitem(last=False)
+            # Pooled keys keep their names; refills need them
+            if old not in self.pools:
+                self.skill_names.pop(old, None)
+
+    async def get(self, skills: list[str]):
+        key = skills_key(skills)
+        self._track(key, skills)
+
+        pool = self.pools.get(key)
+        if pool:
+            questions = pool.popleft()
+            self.counters["hits"] += 1
+            self._schedule_refill(key)
+            return questions
+
+        self.counters["misses"] += 1
+        if self._is_hot(key):
+            self._schedule_refill(key)
+        agent = await self.get_agent()
+        return await agent.agenerate_mcqs(skills)
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "pools": {", ".join(k): len(v) for k, v in self.pools.items()},
+            "refilling": len(self._refilling),
+        }
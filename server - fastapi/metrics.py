@@ -0,0 +1,203 @@
+from contextlib import contextmanager
+import threading
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs.extend(f'{n}="{_escape(v)}"' for n, v in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # labels -> [bucket counts..., sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            row = self._values.setdefault(labels, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def count(self, *labels) -> int:
+        row = self._values.get(labels)
+        return row[-1] if row else 0
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        bounds = [_number(b) for b in self.buckets]
+        with self._lock:
+            rows = sorted((labels, list(row)) for labels, row in self._values.items())
+        for labels, row in rows:
+            label_text = _labels(self.labelnames, labels)
+            # '{a="x"}' -> '{a="x",le=' so each bucket line is one concatenation
+            prefix = f"{self.name}_bucket{label_text[:-1]}," if label_text else f"{self.name}_bucket{{"
+            for bound, count in zip(bounds, row):
+                lines.append(f'{prefix}le="{bound}"}} {count}')
+            lines.append(f"{self.name}_sum{label_text} {_number(float(row[-2]))}")
+            lines.append(f"{self.name}_count{label_text} {row[-1]}")
+        return lines
+
+
+# ---------- Metrics ----------
+# Stages: embed, retrieve, format, rank, llm, llm_first_token, parse, grade, ...
+STAGE_SECONDS = Histogram(
+    "skillverse_stage_seconds",
+    "Time spent in each stage of handling a request, per agent.",
+    ["agent", "stage"],
+)
+PROMPT_CHARS = Counter(
+    "skillverse_llm_prompt_chars_total", "Characters sent to the LLM.", ["agent"]
+)
+RESPONSE_CHARS = Counter(
+    "skillverse_llm_response_chars_total", "Characters received from the LLM.", ["agent"]
+)
+LLM_ERRORS = Counter("skillverse_llm_errors_total", "LLM calls that raised.", ["agent"])
+PARSE_FAILURES = Counter(
+    "skillverse_parse_failures_total",
+    "LLM replies that could not be parsed as the expected JSON.",
+    ["agent"],
+)
+CHAT_ROUTES = Counter(
+    "skillverse_chat_routes_total", "Chat questions by route.", ["route"]
+)
+CONTEXT_CHARS_REMOVED = Counter(
+    "skillverse_context_chars_removed_total",
+    "Retrieved characters left out of prompts (duplicate, overlap or budget).",
+    ["agent", "reason"],
+)
+GATEWAY_EVENTS = Counter(
+    "skillverse_llm_gateway_events_total",
+    "LLM gateway calls, coalesced calls, retries, timeouts and failures.",
+    ["event"],
+)
+HTTP_SECONDS = Histogram(
+    "skillverse_http_request_seconds",
+    "Time until the response headers are sent, per endpoint.",
+    ["method", "path", "status"],
+)
+
+REGISTRY = [
+    STAGE_SECONDS,
+    PROMPT_CHARS,
+    RESPONSE_CHARS,
+    LLM_ERRORS,
+    PARSE_FAILURES,
+    CHAT_ROUTES,
+    CONTEXT_CHARS_REMOVED,
+    GATEWAY_EVENTS,
+    HTTP_SECONDS,
+]
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def timed(agent: str, stage: str):
+    """Record how long the ``with`` block took as ``stage`` of ``agent``.
+
+    Also fine around ``await``: it measures wall time, not CPU time.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, agent, stage)
+
+
+class LLMMetrics(BaseCallbackHandler):
+    """Callback recording LLM latency, time to first token and prompt/reply sizes.
+
+    Attach it to a chain with ``chain.with_config(callbacks=[LLMMetrics(agent)])``.
+    """
+
+    # Bookkeeping only; no need to hop to an executor for it
+    run_inline = True
+
+    def __init__(self, agent: str):
+        self.agent = agent
+        self._runs = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        chars = sum(len(str(m.content)) for batch in messages for m in batch)
+        PROMPT_CHARS.inc(self.agent, amount=chars)
+        self._runs[run_id] = [time.perf_counter(), False]
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        PROMPT_CHARS.inc(self.agent, amount=sum(len(p) for p in prompts))
+        self._runs[run_id] = [time.perf_counter(), False]
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        run = self._runs.get(run_id)
+        if run and not run[1]:
+            run[1] = True
+            STAGE_SECONDS.observe(
+                time.perf_counter() - run[0], self.agent, "llm_first_token"
+            )
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run:
+            STAGE_SECONDS.observe(time.perf_counter() - run[0], self.agent, "llm")
+        chars = sum(len(g.text) for gens in response.generations for g in gens)
+        RESPONSE_CHARS.inc(self.agent, amount=chars)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._runs.pop(run_id, None)
+        LLM_ERRORS.inc(self.agent)
+
+
+def with_metrics(chain, agent: str):
+    """``chain`` with LLM metrics recorded under ``agent``."""
+    return chain.with_config(callbacks=[LLMMetrics(agent)])
@@ -1,22 +1,26 @@
 from pathlib import Path
+import asyncio
 import json
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
+from agent_concurrency import make_limiter
+from llm_gateway import get_gateway, default_chat_model, PRIORITY_NORMAL
+from dataset_loader import load_records, job_id
+from metrics import with_metrics
+
 
 class CoverLetterAgent:
-    def __init__(self, llm=None, data_file="jobs_dataset.json"):
+    def __init__(self, llm=None, data_file="jobs_dataset.json", max_concurrency=None):
         self.data_file = Path(data_file)
+        self.limiter = make_limiter("proposal_agent", max_concurrency)
 
-        if not self.data_file.exists():
-            raise FileNotFoundError(f"Missing dataset: {self.data_file}")
-
-        with open(self.data_file, "r", encoding="utf-8") as f:
-            self.jobs = json.load(f)
+        # Job ID -> posting, so callers can ask for letters by ID alone
+        self.jobs = load_records(self.data_file)
+        self.jobs_by_id = {job_id(job): job for job in self.jobs}
 
-        self.llm = llm or ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash-latest", temperature=0.7
+        self.llm = get_gateway().wrap(
+            llm or default_chat_model("gemini-1.5-flash-latest", temperature=0.7), PRIORITY_NORMAL
         )
 
         self.cover_letter_prompt = ChatPromptTemplate.from_messages(
@@ -54,7 +58,31 @@ class CoverLetterAgent:
             ]
         )
 
-        self.chain = self.cover_letter_prompt | self.llm | StrOutputParser()
+        self.chain = with_metrics(
+            self.cover_letter_prompt | self.llm | StrOutputParser(), "proposal"
+        )
+
+    def reload(self):
+        jobs = load_records(self.data_file)
+        # Swap both at once so lookups never see a half-built index
+        self.jobs, self.jobs_by_id = jobs, {job_id(job): job for job in jobs}
+        return {"total": len(self.jobs)}
+
+    def get_job(self, id: str):
+        return self.jobs_by_id.get(id)
+
+    def _chain_input(
+        self, name, email, skills, job_title, description, client_name, client_company
+    ):
+        return {
+            "job_title": job_title,
+            "description": description,
+            "client_name": client_name or "Hiring Manager",
+            "client_company": client_company or "the company",
+            "name": name,
+            "email": email,
+            "skills": ", ".join(skills),
+        }
 
     def generate_cover_letter(
         self,
@@ -69,15 +97,73 @@ class CoverLetterAgent:
         """Generate a customized cover letter for a job application."""
 
         cover_letter = self.chain.invoke(
-            {
-                "job_title": job_title,
-                "description": description,
-                "client_name": client_name or "Hiring Manager",
-                "client_company": client_company or "the company",
-                "name": name,
-                "email": email,
-                "skills": ", ".join(skills),
-            }
+            self._chain_input(
+                name, email, skills, job_title, description, client_name, client_company
+            )
         )
 
         return {"cover_letter": cover_letter}
+
+    async def agenerate_cover_letter(
+        self,
+        name: str,
+        email: str,
+        skills: list[str],
+        job_title: str,
+        description: str,
+        client_name: str = "",
+        client_company: str = "",
+    ):
+        """Async variant of ``generate_cover_letter``."""
+
+        async with self.limiter:
+            cover_letter = await self.chain.ainvoke(
+                self._chain_input(
+                    name, email, skills, job_title, description, client_name, client_company
+                )
+            )
+
+        return {"cover_letter": cover_letter}
+
+    async def agenerate_bulk(self, candidate: dict, job_ids: list[str]):
+        """Write one cover letter per job ID, yielding (event, data) pairs.
+
+        Jobs are looked up in the in-memory index; the letters are generated
+        concurrently (bounded by the agent's limiter) and each ``letter`` event
+        is sent as soon as it is ready, then ``done`` with the counts.
+        """
+        results = {"ok": 0, "failed": 0}
+
+        async def write(id: str, job: dict):
+            try:
+                reply = await self.agenerate_cover_letter(
+                    name=candidate.get("name", ""),
+                    email=candidate.get("email", ""),
+                    skills=candidate.get("skills", []),
+                    job_title=job.get("title", ""),
+                    description=job.get("description", ""),
+                )
+                return {"job_id": id, "job_title": job.get("title", ""), **reply}
+            except Exception as e:
+                return {"job_id": id, "error": f"{type(e).__name__}: {e}"}
+
+        tasks = []
+        for id in dict.fromkeys(job_ids):
+            job = self.get_job(id)
+            if job is None:
+                results["failed"] += 1
+                yield "letter", {"job_id": id, "error": "Unknown job ID"}
+            else:
+                tasks.append(asyncio.create_task(write(id, job)))
+
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                letter = await next_done
+                results["failed" if "error" in letter else "ok"] += 1
+                yield "letter", letter
+        finally:
+            # The client went away: don't keep paying for letters nobody reads
+            for task in tasks:
+                task.cancel()
+
+        yield "done", results
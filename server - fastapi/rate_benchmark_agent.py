@@ -1,39 +1,38 @@
 from pathlib import Path
+import asyncio
 import json
-from langchain_community.vectorstores import Chroma
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import SystemMessage
 from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv
 
+from dataset_loader import load_records
+from rate_stats import RateTable
+from agent_concurrency import make_limiter
+from llm_gateway import get_gateway, default_chat_model, PRIORITY_NORMAL
+from metrics import timed, with_metrics
+
 load_dotenv()
 
 
 class RateBenchmarkAgent:
-    def __init__(self, llm=None, data_file="jobs_dataset.json"):
+    def __init__(
+        self,
+        llm=None,
+        data_file="jobs_dataset.json",
+        max_concurrency=None,
+        explain_timeout=5.0,
+    ):
         self.data_file = Path(data_file)
+        self.limiter = make_limiter("rate_agent", max_concurrency)
+        self.explain_timeout = explain_timeout
 
-        if not self.data_file.exists():
-            raise FileNotFoundError(f"Missing dataset: {self.data_file}")
-
-        # Load dataset
-        with open(self.data_file, "r", encoding="utf-8") as f:
-            dataset_text = f.read()
-
-        # Chunk dataset
-        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        chunks = splitter.create_documents([dataset_text])
-
-        # Vector DB
-        embedding = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-        self.vector_store = Chroma.from_documents(chunks, embedding)
-        self.retriever = self.vector_store.as_retriever(search_kwargs={"k": 6})
+        # Budgets indexed by title and skill; stats are computed locally
+        self.table = RateTable(load_records(self.data_file))
 
-        # LLM
-        self.llm = llm or ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash-latest", temperature=0.2
+        # LLM (only used for the optional recommendation text)
+        self.llm = get_gateway().wrap(
+            llm or default_chat_model("gemini-1.5-flash-latest", temperature=0.2), PRIORITY_NORMAL
         )
 
         # Prompt
@@ -42,100 +41,92 @@ class RateBenchmarkAgent:
                 SystemMessage(
                     content="""You are a freelance market analyst for 'WorkHive'.
 
-Using the provided dataset context, analyze job postings and benchmark freelance rates.
-
-Return only valid JSON in this structure:
-{
-  "searched_role": "string",
-  "avg_rate": number,
-  "median_rate": number,
-  "min_rate": number,
-  "max_rate": number,
-  "p10_rate": number,
-  "p90_rate": number,
-  "suggested_range": {
-    "floor": number,
-    "ceiling": number,
-    "point": number
-  },
-  "recommendation": "string"
-}
+You are given exact rate statistics (per hour) computed from job postings that match the user's query.
 
 Rules:
-- Extract rates (budgets/hour) from dataset context
-- Compute descriptive stats (mean, median, min, max, approx percentiles)
-- Suggest a fair range for freelancers
-- Keep recommendation short, actionable
-- Do NOT return text outside JSON
+- Write ONE short, actionable recommendation (max 2 sentences) for a freelancer pricing this role
+- Use the numbers as given, do NOT recompute them
+- Return plain text only, no JSON or markdown
 """
                 ),
-                ("human", "Context:\n{context}\n\nUser query: {query}"),
+                ("human", "Statistics:\n{stats}\n\nUser query: {query}"),
             ]
         )
 
-        self.chain = self.rate_prompt | self.llm | StrOutputParser()
-
-    def format_docs(self, docs):
-        return "\n\n".join(d.page_content for d in docs)
-
-    def benchmark(self, query: str):
-        # Retrieve dataset chunks
-        relevant_docs = self.retriever.invoke(query)
-        context = self.format_docs(relevant_docs)
-
-        if not context or len(context.strip()) < 50:
-            return {
-                "searched_role": query,
-                "avg_rate": 0,
-                "median_rate": 0,
-                "min_rate": 0,
-                "max_rate": 0,
-                "p10_rate": 0,
-                "p90_rate": 0,
-                "suggested_range": {"floor": 0, "ceiling": 0, "point": 0},
-                "recommendation": "Not enough data to benchmark rates. Try a more specific role.",
-            }
-
-        raw_reply = self.chain.invoke({"query": query, "context": context})
-
-        # --- Ensure JSON parsing ---
-        try:
-            if raw_reply.strip().startswith("```"):
-                raw_reply = raw_reply.strip().strip("`").replace("json", "", 1).strip()
-
-            result = json.loads(raw_reply)
-
-            # 🔒 Ensure all required fields exist (fallbacks for frontend safety)
-            safe_result = {
-                "searched_role": result.get("searched_role", query),
-                "avg_rate": result.get("avg_rate", 0),
-                "median_rate": result.get("median_rate", 0),
-                "min_rate": result.get("min_rate", 0),
-                "max_rate": result.get("max_rate", 0),
-                "p10_rate": result.get("p10_rate", 0),
-                "p90_rate": result.get("p90_rate", 0),
-                "suggested_range": {
-                    "floor": result.get("suggested_range", {}).get("floor", 0),
-                    "ceiling": result.get("suggested_range", {}).get("ceiling", 0),
-                    "point": result.get("suggested_range", {}).get("point", 0),
-                },
-                "recommendation": result.get(
-                    "recommendation", "No recommendation generated."
-                ),
-            }
-
-            return safe_result
-
-        except Exception:
-            # fallback if JSON fails
-            return {
-                "searched_role": query,
-                "avg_rate": 0,
-                "median_rate": 0,
-                "min_rate": 0,
-                "max_rate": 0,
-                "p10_rate": 0,
-                "p90_rate": 0,
-                "suggested_range": {"floor": 0, "ceiling": 0, "point": 0},
-                "recommendation": "Failed to generate benchmark. Please try again.",
-            }
+        self.chain = with_metrics(self.rate_prompt | self.llm | StrOutputParser(), "rate")
+
+    def reload(self):
+        # Rebuilding the table is cheap; swap it in one assignment
+        self.table = RateTable(load_records(self.data_file))
+        return {"total": len(self.table)}
+
+    def _empty_result(self, query: str):
+        return {
+            "searched_role": query,
+            "avg_rate": 0,
+            "median_rate": 0,
+            "min_rate": 0,
+            "max_rate": 0,
+            "p10_rate": 0,
+            "p90_rate": 0,
+            "suggested_range": {"floor": 0, "ceiling": 0, "point": 0},
+            "sample_size": 0,
+            "recommendation": "Not enough data to benchmark rates. Try a more specific role.",
+        }
+
+    def _default_recommendation(self, stats: dict):
+        rng = stats["suggested_range"]
+        return (
+            f"Based on {stats['sample_size']} matching job postings, aim for "
+            f"${rng['floor']}–${rng['ceiling']}/hr, with ${rng['point']}/hr as the market midpoint."
+        )
+
+    def _local_benchmark(self, query: str):
+        with timed("rate", "match"):
+            rows = self.table.match(query)
+        if rows.size == 0:
+            return None
+
+        with timed("rate", "stats"):
+            stats = self.table.stats(rows)
+        result = {"searched_role": query, **stats}
+        result["recommendation"] = self._default_recommendation(stats)
+        return result
+
+    def benchmark(self, query: str, explain: bool = False):
+        result = self._local_benchmark(query)
+        if result is None:
+            return self._empty_result(query)
+
+        if explain:
+            # The numbers never depend on the LLM; if it fails we keep the default text
+            try:
+                stats = {k: v for k, v in result.items() if k != "recommendation"}
+                text = self.chain.invoke({"query": query, "stats": json.dumps(stats)})
+                if text and text.strip():
+                    result["recommendation"] = text.strip()
+            except Exception as e:
+                print(f"❌ Rate recommendation error: {e}, using default text")
+
+        return result
+
+    async def abenchmark(self, query: str, explain: bool = False):
+        result = self._local_benchmark(query)
+        if result is None:
+            return self._empty_result(query)
+
+        if explain:
+            # A slow or failing LLM only costs us the nicer wording, never the stats
+            try:
+                stats = {k: v for k, v in result.items() if k != "recommendation"}
+                async with self.limiter:
+                    text = await asyncio.wait_for(
+                        self.chain.ainvoke({"query": query, "stats": json.dumps(stats)}),
+                        timeout=self.explain_timeout,
+                    )
+                if text and text.strip():
+                    result["recommendation"] = text.strip()
+            except Exception as e:
+                print(f"❌ Rate recommendation error: {e!r}, using default text")
+
+        return result
@@ -0,0 +1,103 @@
+from collections import defaultdict
+import numpy as np
+
+from text_utils import tokenize, PhraseMatcher
+
+# Role words shared by many titles; only used when nothing more specific matches
+GENERIC_TITLE_WORDS = {
+    "developer",
+    "engineer",
+    "analyst",
+    "designer",
+    "manager",
+    "scientist",
+    "architect",
+    "director",
+    "writer",
+    "intern",
+    "research",
+    "app",
+}
+
+
+def _round(value) -> float:
+    return round(float(value), 2)
+
+
+class RateTable:
+    """Column store of job budgets indexed by title and skill.
+
+    Budgets live in one NumPy array; the indexes map a title, title keyword or
+    skill to the row numbers that carry it, so a query only touches matching rows.
+    """
+
+    def __init__(self, jobs: list[dict]):
+        self.budgets = np.array(
+            [float(job.get("budget") or 0) for job in jobs], dtype=np.float64
+        )
+
+        title_rows = defaultdict(list)
+        keyword_rows = defaultdict(list)
+        skill_rows = defaultdict(list)
+        for row, job in enumerate(jobs):
+            if not job.get("budget"):
+                continue
+            title = job.get("title", "")
+            if title:
+                title_rows[title.lower()].append(row)
+            for token in set(tokenize(title)):
+                keyword_rows[token].append(row)
+            for skill in job.get("skillsRequired") or []:
+                skill_rows[skill.lower()].append(row)
+
+        self.title_index = {k: np.array(v, dtype=np.intp) for k, v in title_rows.items()}
+        self.keyword_index = {k: np.array(v, dtype=np.intp) for k, v in keyword_rows.items()}
+        self.skill_index = {k: np.array(v, dtype=np.intp) for k, v in skill_rows.items()}
+
+        self.phrases = PhraseMatcher([*self.title_index, *self.skill_index])
+
+    def __len__(self):
+        return len(self.budgets)
+
+    def match(self, query: str) -> np.ndarray:
+        """Row numbers of the jobs relevant to ``query``.
+
+        Exact titles and skills named in the query win; otherwise specific title
+        keywords ("frontend", "blockchain"); generic role words come last.
+        """
+        tokens = set(tokenize(query))
+        hits = [
+            index[phrase]
+            for phrase in self.phrases.find(query)
+            for index in (self.title_index, self.skill_index)
+            if phrase in index
+        ]
+
+        if not hits:
+            specific = tokens - GENERIC_TITLE_WORDS
+            hits = [self.keyword_index[t] for t in specific if t in self.keyword_index]
+            if not hits:
+                hits = [self.keyword_index[t] for t in tokens if t in self.keyword_index]
+
+        if not hits:
+            return np.empty(0, dtype=np.intp)
+        return np.unique(np.concatenate(hits))
+
+    def stats(self, rows: np.ndarray) -> dict:
+        """Exact descriptive statistics and a suggested range for the given rows."""
+        budgets = self.budgets[rows]
+        p10, p25, median, p75, p90 = np.percentile(budgets, [10, 25, 50, 75, 90])
+        return {
+            "avg_rate": _round(budgets.mean()),
+            "median_rate": _round(median),
+            "min_rate": _round(budgets.min()),
+            "max_rate": _round(budgets.max()),
+            "p10_rate": _round(p10),
+            "p90_rate": _round(p90),
+            "suggested_range": {
+                "floor": _round(p25),
+                "ceiling": _round(p75),
+                "point": _round(median),
+            },
+            "sample_size": int(budgets.size),
+        }
@@ -0,0 +1,134 @@
+from collections import OrderedDict
+import os
+import time
+import numpy as np
+from dotenv import load_dotenv
+
+from text_utils import tokenize
+
+load_dotenv()
+
+DEFAULT_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.92"))
+DEFAULT_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+DEFAULT_MAX_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(tokenize(text))
+
+
+class SemanticCache:
+    """TTL + LRU response cache that also matches paraphrased queries.
+
+    A lookup first tries the normalized text, then the cosine similarity of
+    the query embedding against every cached entry.
+
+    Whoever reloads the data behind the answers calls ``invalidate`` once the
+    new data is live. Answers computed before that are stale: callers pass the
+    ``generation`` they read before computing to ``aset``, which drops the
+    value if an invalidation happened in between.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        embedding,
+        threshold: float = DEFAULT_THRESHOLD,
+        ttl: float = DEFAULT_TTL,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ):
+        self.name = name
+        self.embedding = embedding
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_size = max_size
+
+        # normalized text -> (unit vector or None, value, expires_at)
+        self._entries = OrderedDict()
+        self.generation = 0
+        self.counters = {
+            "hits_exact": 0,
+            "hits_semantic": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    def _drop_expired(self, now: float):
+        expired = [k for k, (_, _, expires_at) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        self.counters["expirations"] += len(expired)
+
+    async def _embed(self, key: str):
+        try:
+            vector = np.asarray(await self.embedding.aembed_query(key), dtype=np.float32)
+        except Exception as e:
+            print(f"❌ Cache embedding error: {e}, using exact matching only")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def clear(self):
+        self._entries.clear()
+
+    def invalidate(self):
+        """Drop every entry and refuse values computed from the old data."""
+        self.generation += 1
+        self.clear()
+        self.counters["invalidations"] += 1
+
+    async def aget(self, text: str):
+        """Return the cached value for ``text`` (or a close paraphrase), else None."""
+        self._drop_expired(time.monotonic())
+
+        key = normalize_text(text)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.counters["hits_exact"] += 1
+            return self._entries[key][1]
+
+        candidates = [(k, v) for k, (v, _, _) in self._entries.items() if v is not None]
+        if candidates:
+            query = await self._embed(key)
+            if query is not None:
+                matrix = np.stack([v for _, v in candidates])
+                scores = matrix @ query
+                best = int(np.argmax(scores))
+                best_key = candidates[best][0]
+                # The entry may have been evicted while we awaited the embedding
+                if scores[best] >= self.threshold and best_key in self._entries:
+                    self._entries.move_to_end(best_key)
+                    self.counters["hits_semantic"] += 1
+                    return self._entries[best_key][1]
+
+        self.counters["misses"] += 1
+        return None
+
+    async def aset(self, text: str, value, generation: int = None):
+        """Cache ``value``; ignored if ``generation`` (read before computing
+        it) predates the last ``invalidate``."""
+        if generation is not None and generation != self.generation:
+            return
+        key = normalize_text(text)
+        vector = await self._embed(key)
+        if generation is not None and generation != self.generation:
+            return
+        self._entries[key] = (vector, value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def stats(self) -> dict:
+        hits = self.counters["hits_exact"] + self.counters["hits_semantic"]
+        lookups = hits + self.counters["misses"]
+        return {
+            **self.counters,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "threshold": self.threshold,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
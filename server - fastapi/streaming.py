@@ -0,0 +1,115 @@
+import json
+
+
+def sse_event(event: str, data) -> str:
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def ndjson_event(event: str, data) -> str:
+    """Format one event as a line of newline-delimited JSON."""
+    return json.dumps({"event": event, "data": data}, ensure_ascii=False) + "\n"
+
+
+class JsonArrayStream:
+    """Incremental parser for a JSON array of objects arriving in chunks.
+
+    ``feed`` returns every element that became complete with the new text, so
+    callers can act on the first object long before the closing ``]``.
+    Anything before the first ``[`` (code fences, a stray sentence) is
+    skipped. Elements that are not valid JSON are counted in ``skipped``.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.finished = False
+        self.skipped = 0
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, text: str) -> list:
+        items = []
+        for ch in text:
+            if self.finished:
+                break
+            if not self.started:
+                self.started = ch == "["
+                continue
+
+            if self._depth > 0:
+                self._buffer.append(ch)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                if self._depth == 0:
+                    # Scalars at the top level are not objects we can use
+                    self.skipped += 1
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 0:
+                    self._buffer = [ch]
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0:
+                    # The array's own closing bracket
+                    self.finished = ch == "]"
+                    continue
+                self._depth -= 1
+                if self._depth == 0:
+                    element = "".join(self._buffer)
+                    self._buffer = []
+                    try:
+                        items.append(json.loads(element))
+                    except ValueError:
+                        self.skipped += 1
+        return items
+
+
+def _strip_fences(text: str) -> str:
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`").strip()
+        if text.lower().startswith("json"):
+            text = text[4:]
+    return text.strip()
+
+
+async def aiter_json_array(chunks):
+    """Yield each object of a JSON array streamed as text ``chunks``.
+
+    Objects are yielded as soon as they are complete. A reply without an
+    array (e.g. a single object) is parsed whole once the stream ends;
+    ``ValueError`` is raised if nothing usable came back.
+    """
+    parser = JsonArrayStream()
+    raw = []
+    yielded = 0
+    async for chunk in chunks:
+        raw.append(chunk)
+        for item in parser.feed(chunk):
+            if isinstance(item, dict):
+                yielded += 1
+                yield item
+
+    if parser.started:
+        if not yielded and parser.skipped:
+            raise ValueError("Failed to parse model reply")
+        return
+
+    parsed = json.loads(_strip_fences("".join(raw)))
+    if isinstance(parsed, dict):
+        yield parsed
+    elif isinstance(parsed, list):
+        for item in parsed:
+            if isinstance(item, dict):
+                yield item
+    else:
+        raise ValueError("Failed to parse model reply")
@@ -0,0 +1,5 @@
+from pathlib import Path
+import sys
+
+# The service modules live next to this directory, not in a package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
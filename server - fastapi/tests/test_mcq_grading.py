@@ -0,0 +1,34 @@
+from mcq_agent import McqAgent
+
+# Grading is local; no model is needed
+agent = McqAgent.__new__(McqAgent)
+
+LETTER_TEXTS = ["A) True", "B) False", "C) TypeError", "D) B"]
+
+
+def grade(options, correct, answer):
+    question = {"question": "q", "options": options, "correct_option": correct}
+    return agent.grade_mcqs([question], {"0": answer})[0]
+
+
+def test_answer_key_is_read_as_a_letter_even_if_an_option_text_is_one():
+    result = grade(LETTER_TEXTS, "B", "B) False")
+    assert result["correct_answer"] == "B"
+    assert result["is_correct"]
+
+
+def test_bare_letter_answer_wins_over_an_option_whose_text_is_that_letter():
+    assert agent._option_letter("A", ["A) 1", "B) A", "C) 2", "D) 3"]) == "A"
+    assert agent._option_letter("B", LETTER_TEXTS) == "B"
+
+
+def test_full_option_string_matches_before_its_letter_prefix():
+    assert agent._option_letter("D) B", LETTER_TEXTS) == "D"
+
+
+def test_bare_option_text_is_not_read_as_a_letter():
+    options = ["A) Array", "B) A linked list", "C) B-tree", "D) Hash map"]
+    assert agent._option_letter("A linked list", options) == "B"
+    assert agent._option_letter("B-tree", options) == "C"
+    assert agent._option_letter("c. anything", options) == "C"
+    assert agent._option_letter("A-star", options) == ""
@@ -0,0 +1,48 @@
+import re
+from functools import lru_cache
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English; close enough for budgeting
+    return len(text) // 4 + 1
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-cased alphanumeric tokens of ``text``."""
+    return re.findall(r"[a-z0-9]+", (text or "").lower())
+
+
+@lru_cache(maxsize=4096)
+def _phrase_pattern(phrase: str):
+    # Word-ish boundaries that still work for names like "C++", "C#" or "Node.js"
+    return re.compile(r"(?<![\w+#.])" + re.escape(phrase.lower()) + r"(?![\w+#])")
+
+
+def contains_phrase(text: str, phrase: str) -> bool:
+    """True when ``phrase`` occurs in ``text`` as a whole word/term (case-insensitive)."""
+    if not phrase:
+        return False
+    return _phrase_pattern(phrase.lower()).search((text or "").lower()) is not None
+
+
+class PhraseMatcher:
+    """Finds which of a fixed set of phrases occur in a text.
+
+    Phrases are bucketed by their first token, so only phrases whose first
+    token appears in the text are checked with a regex.
+    """
+
+    def __init__(self, phrases):
+        self.by_first_token = {}
+        for phrase in dict.fromkeys(phrases):
+            tokens = tokenize(phrase)
+            if tokens:
+                self.by_first_token.setdefault(tokens[0], []).append(phrase)
+
+    def find(self, text: str) -> list[str]:
+        found = []
+        for token in dict.fromkeys(tokenize(text)):
+            for phrase in self.by_first_token.get(token, ()):
+                if contains_phrase(text, phrase):
+                    found.append(phrase)
+        return found
@@ -1,37 +1,44 @@
 from pathlib import Path
+import asyncio
 import json
-from langchain_community.vectorstores import Chroma
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import TextLoader
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import SystemMessage
 from langchain_core.output_parsers import StrOutputParser
 
+from embedding_store import get_embedding
+from document_index import DocumentIndex
+from dataset_loader import load_records, user_to_document
+from candidate_ranking import CandidateRanker, parse_rate
+from agent_concurrency import make_limiter
+from llm_gateway import get_gateway, default_chat_model, PRIORITY_INTERACTIVE
+from context_assembly import assemble_context
+from metrics import timed, with_metrics, PARSE_FAILURES
+from streaming import aiter_json_array
+
 
 class UserRecommenderAgent:
-    def __init__(self, llm=None, data_file="users_dataset.json"):
+    def __init__(self, llm=None, data_file="users_dataset.json", max_concurrency=None):
         self.data_file = Path(data_file)
+        self.limiter = make_limiter("user_agent", max_concurrency)
 
-        if not self.data_file.exists():
-            raise FileNotFoundError(f"Missing dataset: {self.data_file}")
+        users = load_records(self.data_file)
 
-        # Load dataset
-        with open(self.data_file, "r", encoding="utf-8") as f:
-            dataset_text = f.read()
+        # Exact skill/stars/rate ranking over every user
+        self.ranker = CandidateRanker(users)
 
-        # Split into chunks for embedding
-        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        chunks = splitter.create_documents([dataset_text])
+        # One document per user profile so every hit is a whole record
+        docs = [user_to_document(u) for u in users]
 
         # Embedding + Vector DB
-        embedding = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-        self.vector_store = Chroma.from_documents(chunks, embedding)
-        self.retriever = self.vector_store.as_retriever(search_kwargs={"k": 6})
+        self.embedding = get_embedding()
+        self.k = 8
+        self.index = DocumentIndex("users", docs, self.embedding, k=self.k)
+        self.vector_store = self.index.vector_store
+        self.retriever = self.index.retriever
 
         # LLM
-        self.llm = llm or ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash-latest", temperature=0.2
+        self.llm = get_gateway().wrap(
+            llm or default_chat_model("gemini-1.5-flash-latest", temperature=0.2), PRIORITY_INTERACTIVE
         )
 
         # Prompt
@@ -69,28 +76,238 @@ class UserRecommenderAgent:
             ]
         )
 
-        self.chain = self.user_prompt | self.llm | StrOutputParser()
+        self.chain = with_metrics(self.user_prompt | self.llm | StrOutputParser(), "user")
+
+        # Optional: one-sentence justification per locally ranked candidate
+        self.justify_prompt = ChatPromptTemplate.from_messages(
+            [
+                SystemMessage(
+                    content="""You are an AI recruiter for the 'WorkHive' platform.
+The candidates below are already ranked; do NOT reorder, add or remove any.
+For each candidate write ONE short sentence on why they fit the job.
+
+Return ONLY valid JSON mapping each candidate's email to the sentence:
+{"email": "justification"}
+"""
+                ),
+                ("human", "Job description/query: {query}\n\nCandidates:\n{candidates}"),
+            ]
+        )
+        self.justify_chain = with_metrics(
+            self.justify_prompt | self.llm | StrOutputParser(), "user"
+        )
+
+    def reload(self):
+        """Re-read the dataset: swap in a fresh ranker, upsert changed profiles."""
+        users = load_records(self.data_file)
+        self.ranker = CandidateRanker(users)
+        return self.index.sync([user_to_document(u) for u in users])
 
     def format_docs(self, docs):
-        return "\n\n".join(d.page_content for d in docs)
+        # Whole records only: a cut-off JSON object is worse than a missing one
+        return assemble_context(docs, "user", truncate=False)
+
+    def _parse_reply(self, raw_reply: str):
+        with timed("user", "parse"):
+            try:
+                if raw_reply.strip().startswith("```"):
+                    raw_reply = raw_reply.strip().strip("`").replace("json", "", 1).strip()
+
+                users = json.loads(raw_reply)
+                return {"users": users}
+            except Exception:
+                PARSE_FAILURES.inc("user")
+                return {"text": raw_reply}
+
+    def _not_enough_context(self):
+        return {
+            "error": "Not enough user data found. Please provide a more detailed job description."
+        }
+
+    def _rank(self, job_query: str, skills=None, target_rate=None, k: int = 5):
+        """Locally ranked candidates, or None when no known skill is named
+        (the caller then falls back to retrieval and the LLM)."""
+        skills = skills or self.ranker.extract_skills(job_query)
+        if not any(s.lower() in self.ranker.skill_index for s in skills):
+            return None
+        if target_rate is None:
+            target_rate = parse_rate(job_query)
+        with timed("user", "rank"):
+            return self.ranker.top_candidates(skills, target_rate, k)
+
+    @staticmethod
+    def _search_text(job_query: str, skills=None) -> str:
+        # A skills-only request still needs text to retrieve and prompt with
+        return job_query or ", ".join(skills or [])
+
+    def _justify_input(self, job_query: str, users: list[dict]):
+        return {"query": job_query, "candidates": json.dumps(users, indent=2)}
+
+    def _apply_justifications(self, users: list[dict], raw_reply: str):
+        parsed = self._parse_reply(raw_reply).get("users")
+        if isinstance(parsed, dict):
+            for user in users:
+                if parsed.get(user["email"]):
+                    user["justification"] = parsed[user["email"]]
+        return users
+
+    def recommend(
+        self, job_query: str, skills=None, target_rate=None, explain=False, k: int = 5
+    ):
+        users = self._rank(job_query, skills, target_rate, k)
+        if users is not None:
+            if explain and users:
+                try:
+                    raw_reply = self.justify_chain.invoke(
+                        self._justify_input(job_query, users)
+                    )
+                    users = self._apply_justifications(users, raw_reply)
+                except Exception as e:
+                    print(f"❌ Justification error: {e}, returning ranking only")
+            return {"users": users}
 
-    def recommend(self, job_query: str):
-        # Retrieve most relevant user docs
+        # No recognizable skills: let the LLM pick from retrieved profiles
+        job_query = self._search_text(job_query, skills)
         relevant_docs = self.retriever.invoke(job_query)
         context = self.format_docs(relevant_docs)
 
         if not context or len(context.strip()) < 50:
-            return {
-                "error": "Not enough user data found. Please provide a more detailed job description."
-            }
+            return self._not_enough_context()
 
         raw_reply = self.chain.invoke({"query": job_query, "context": context})
+        return self._parse_reply(raw_reply)
 
+    async def _ajustify(self, job_query: str, users: list[dict]):
         try:
-            if raw_reply.strip().startswith("```"):
-                raw_reply = raw_reply.strip().strip("`").replace("json", "", 1).strip()
+            async with self.limiter:
+                raw_reply = await self.justify_chain.ainvoke(
+                    self._justify_input(job_query, users)
+                )
+            return self._apply_justifications(users, raw_reply)
+        except Exception as e:
+            print(f"❌ Justification error: {e}, returning ranking only")
+            return users
 
-            users = json.loads(raw_reply)
+    async def _agenerate(self, job_query: str, relevant_docs):
+        with timed("user", "format"):
+            context = self.format_docs(relevant_docs)
+        if not context or len(context.strip()) < 50:
+            return self._not_enough_context()
+
+        async with self.limiter:
+            raw_reply = await self.chain.ainvoke({"query": job_query, "context": context})
+        return self._parse_reply(raw_reply)
+
+    async def arecommend(
+        self, job_query: str, skills=None, target_rate=None, explain=False, k: int = 5
+    ):
+        users = self._rank(job_query, skills, target_rate, k)
+        if users is not None:
+            if explain and users:
+                users = await self._ajustify(job_query, users)
             return {"users": users}
-        except Exception:
-            return {"text": raw_reply}
+
+        job_query = self._search_text(job_query, skills)
+        relevant_docs = await self.index.asearch(job_query, "user")
+        return await self._agenerate(job_query, relevant_docs)
+
+    async def astream_recommend(
+        self, job_query: str, skills=None, target_rate=None, explain=False, k: int = 5
+    ):
+        """Stream candidates as (event, data) pairs: one ``user`` event each,
+        then ``done`` (or ``error``).
+
+        Locally ranked candidates are all known up front; LLM-picked ones are
+        emitted as soon as each object is complete in the reply.
+        """
+        users = self._rank(job_query, skills, target_rate, k)
+        if users is not None:
+            if explain and users:
+                users = await self._ajustify(job_query, users)
+            for user in users:
+                yield "user", user
+            yield "done", {"count": len(users), "ranked": True}
+            return
+
+        job_query = self._search_text(job_query, skills)
+        relevant_docs = await self.index.asearch(job_query, "user")
+        with timed("user", "format"):
+            context = self.format_docs(relevant_docs)
+        if not context or len(context.strip()) < 50:
+            yield "error", self._not_enough_context()
+            return
+
+        count = 0
+        try:
+            async with self.limiter:
+                chunks = self.chain.astream({"query": job_query, "context": context})
+                async for user in aiter_json_array(chunks):
+                    count += 1
+                    yield "user", user
+        except ValueError:
+            PARSE_FAILURES.inc("user")
+            yield "error", {"error": "Failed to parse model reply"}
+            return
+        yield "done", {"count": count, "ranked": False}
+
+    async def arecommend_batch(self, items: list[dict], explain=False, k: int = 5):
+        """Recommend for many ``{"query", "skills", "rate"}`` items at once.
+
+        Items naming known skills are ranked locally; the rest share one
+        batched embedding call and their generations run under the agent's
+        limiter. Returns one result per item; a failing item carries ``error``.
+        """
+        results = [None] * len(items)
+        pending = []
+        for i, item in enumerate(items):
+            try:
+                rate = item.get("rate")
+                users = self._rank(
+                    item.get("query", ""),
+                    item.get("skills"),
+                    float(rate) if rate is not None else None,
+                    k,
+                )
+            except Exception as e:
+                results[i] = {"error": f"{type(e).__name__}: {e}"}
+                continue
+            if users is None:
+                pending.append(i)
+            else:
+                results[i] = {"users": users}
+
+        async def finish(i):
+            if explain and results[i]["users"]:
+                results[i]["users"] = await self._ajustify(
+                    items[i].get("query", ""), results[i]["users"]
+                )
+
+        tasks = [finish(i) for i, r in enumerate(results) if r and "users" in r]
+
+        if pending:
+            queries = [
+                self._search_text(items[i].get("query", ""), items[i].get("skills"))
+                for i in pending
+            ]
+            try:
+                with timed("user", "embed"):
+                    vectors = await self.embedding.aembed_queries(queries)
+            except Exception as e:
+                vectors = [e] * len(queries)
+
+            async def generate(i, query, vector):
+                try:
+                    if isinstance(vector, Exception):
+                        raise vector
+                    with timed("user", "retrieve"):
+                        docs = await self.vector_store.asimilarity_search_by_vector(
+                            vector, k=self.k
+                        )
+                    results[i] = await self._agenerate(query, docs)
+                except Exception as e:
+                    results[i] = {"error": f"{type(e).__name__}: {e}"}
+
+            tasks += [generate(i, q, v) for i, q, v in zip(pending, queries, vectors)]
+
+        await asyncio.gather(*tasks)
+        return results
@@ -0,0 +1,517 @@
+from pathlib import Path
+from typing import Iterable, List, Optional
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, builds just may repeat
+    fcntl = None
+
+load_dotenv()
+
+# "chroma" (in-process Chroma per index), "mmap" (shared read-only files) or
+# "numpy" (compact in-process array). VECTOR_BACKEND_<INDEX>, e.g.
+# VECTOR_BACKEND_JOBS, overrides it for one index; see ``index_setting``.
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").strip().lower()
+VECTOR_INDEX_DIR = Path(
+    os.getenv("VECTOR_INDEX_DIR", Path(__file__).parent / ".vector_index")
+)
+# Storage type of the "numpy" backend: float32, float16 or int8
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "int8").strip().lower()
+# From this many vectors on, the "numpy" backend searches an IVF index
+# (approximate) instead of every row; 0 disables it
+VECTOR_ANN_THRESHOLD = int(os.getenv("VECTOR_ANN_THRESHOLD", "20000"))
+VECTOR_ANN_NPROBE = int(os.getenv("VECTOR_ANN_NPROBE", "8"))
+
+# Rows scored per step: the float32 copy of a quantized block stays in cache
+BLOCK_ROWS = 1024
+# Texts embedded (and their vectors quantized) per step when adding
+EMBED_BATCH = 1000
+DTYPES = ("float32", "float16", "int8")
+
+
+def index_setting(index: str, key: str, default: str) -> str:
+    """``{key}_{INDEX}`` if set (e.g. ``VECTOR_BACKEND_GUIDES``), else ``default``."""
+    value = os.getenv(f"{key}_{index.upper()}")
+    return value.strip().lower() if value else default
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """float32 copy of ``vectors`` with every row scaled to unit length."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` highest ``scores``, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        best = np.argpartition(-scores, k - 1)[:k]
+    else:
+        best = np.arange(len(scores))
+    return best[np.argsort(-scores[best], kind="stable")]
+
+
+def quantize(matrix: np.ndarray, dtype: str):
+    """``(rows, scales)`` storing unit-length float32 ``matrix`` as ``dtype``.
+
+    int8 rows are scaled per vector so the largest component maps to 127;
+    ``scales`` holds the factor back (None for float types).
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"Unknown vector dtype: {dtype!r}")
+    if dtype != "int8":
+        return np.ascontiguousarray(matrix, dtype=dtype), None
+    peak = np.abs(matrix).max(axis=1) if len(matrix) else np.zeros(0, np.float32)
+    scales = (np.where(peak > 0, peak, 1) / 127).astype(np.float32)
+    rows = np.rint(matrix / scales[:, None]).astype(np.int8)
+    return rows, scales
+
+
+def dequantize(rows: np.ndarray, scales) -> np.ndarray:
+    matrix = rows.astype(np.float32, copy=False)
+    return matrix * scales[:, None] if scales is not None else matrix
+
+
+def block_scores(rows: np.ndarray, scales, query: np.ndarray) -> np.ndarray:
+    """Dot product of every row with unit-length float32 ``query``.
+
+    Rows are converted to float32 a block at a time, so quantized storage
+    still goes through BLAS without a full-size temporary copy.
+    """
+    scores = np.empty(len(rows), dtype=np.float32)
+    for start in range(0, len(rows), BLOCK_ROWS):
+        block = rows[start : start + BLOCK_ROWS]
+        scores[start : start + len(block)] = (
+            block.astype(np.float32, copy=False) @ query
+        )
+    if scales is not None:
+        scores *= scales
+    return scores
+
+
+class IVFIndex:
+    """Inverted-file index: k-means centroids, each with the rows closest to it.
+
+    A search scores only the rows of the ``nprobe`` lists whose centroids are
+    nearest the query, so it is approximate: recall drops as ``nprobe`` does.
+    """
+
+    def __init__(self, rows: np.ndarray, scales=None, nlist: int = None, seed: int = 0):
+        n = len(rows)
+        nlist = min(n, nlist or max(1, int(np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+
+        # Train on a sample; 64 points per list is plenty for k-means
+        sample_idx = rng.choice(n, size=min(n, nlist * 64), replace=False)
+        sample = dequantize(
+            rows[sample_idx], None if scales is None else scales[sample_idx]
+        )
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(10):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            empty = np.bincount(assign, minlength=nlist) == 0
+            # Keep empty lists where they were instead of collapsing them to 0
+            sums[empty] = centroids[empty]
+            centroids = normalize_rows(sums)
+
+        assign = np.empty(n, dtype=np.int64)
+        for start in range(0, n, BLOCK_ROWS):
+            end = start + BLOCK_ROWS
+            block = dequantize(
+                rows[start:end], None if scales is None else scales[start:end]
+            )
+            assign[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+
+        self.centroids = centroids
+        self.order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=nlist)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Row positions in the ``nprobe`` lists nearest ``query``."""
+        lists = top_k(self.centroids @ query, nprobe)
+        return np.concatenate(
+            [self.order[self.offsets[c] : self.offsets[c + 1]] for c in lists]
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self.centroids.nbytes + self.order.nbytes + self.offsets.nbytes
+
+
+@contextlib.contextmanager
+def file_lock(path: Path):
+    """Exclusive lock shared by every process on the host (no-op without fcntl)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _write_atomic(path: Path, write):
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as handle:
+        write(handle)
+    os.replace(tmp, path)
+
+
+class _MatrixSearch(VectorStore):
+    """Search methods shared by the NumPy-backed stores.
+
+    Subclasses implement ``search_with_scores(vector, k, filter)`` returning
+    ``(document, cosine similarity)`` pairs, best first. ``filter`` takes the
+    Chroma form for metadata equality: ``{"field": value}`` or
+    ``{"field": {"$in": [values]}}``, several fields ANDed.
+    """
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    def search_with_scores(self, vector, k: int = 4, filter: dict = None):
+        raise NotImplementedError
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, filter=None, **kwargs):
+        return [doc for doc, _ in self.search_with_scores(embedding, k, filter)]
+
+    async def asimilarity_search_by_vector(
+        self, embedding, k: int = 4, filter=None, **kwargs
+    ):
+        # One matrix-vector product; cheaper than a hop to a worker thread
+        return self.similarity_search_by_vector(embedding, k, filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter=None, **kwargs):
+        return self.similarity_search_by_vector(
+            self.embedding.embed_query(query), k, filter
+        )
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter=None, **kwargs
+    ):
+        return self.search_with_scores(self.embedding.embed_query(query), k, filter)
+
+    def _filter_rows(self, docs: list, filter: dict) -> np.ndarray:
+        """Positions in ``docs`` whose metadata pass ``filter``.
+
+        Uses a value -> rows index per metadata field, built on first use and
+        kept until the documents are swapped out.
+        """
+        cached_docs, fields = getattr(self, "_field_index", (None, {}))
+        if cached_docs is not docs:
+            fields = {}
+            self._field_index = (docs, fields)
+
+        mask = np.ones(len(docs), dtype=bool)
+        for field, condition in filter.items():
+            if field not in fields:
+                rows = {}
+                for row, doc in enumerate(docs):
+                    rows.setdefault(doc.metadata.get(field), []).append(row)
+                fields[field] = {v: np.array(r, dtype=np.intp) for v, r in rows.items()}
+            if isinstance(condition, dict):
+                if set(condition) != {"$in"}:
+                    raise ValueError(f"Unsupported filter on {field!r}: {condition!r}")
+                values = condition["$in"]
+            else:
+                values = [condition]
+            allowed = np.zeros(len(docs), dtype=bool)
+            for value in values:
+                rows = fields[field].get(value)
+                if rows is not None:
+                    allowed[rows] = True
+            mask &= allowed
+        return np.flatnonzero(mask)
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, *, ids=None, **kwargs):
+        store = cls(embedding=embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
+
+
+class MmapVectorStore(_MatrixSearch):
+    """Read-only vector store backed by files every worker process maps.
+
+    Unit-length vectors live in ``<name>-<fingerprint>.npy``, opened with
+    ``mmap_mode="r"`` so the page cache holds one copy for the whole host;
+    documents and IDs live in a JSON file next to it. The fingerprint covers
+    the document IDs and the embedding model, so workers with the same data
+    open the same files. The first one to get the lock builds them, the rest
+    just map them.
+
+    Search is cosine similarity by one matrix-vector product; for unit-length
+    embeddings it ranks like Chroma's L2 distance.
+    """
+
+    def __init__(self, name: str, embedding, directory=VECTOR_INDEX_DIR):
+        self.name = name
+        self.embedding = embedding
+        self.directory = Path(directory)
+        self.path = None
+        # (matrix, documents, ids) swapped in one assignment, so readers never
+        # see a matrix from one build and documents from another
+        self._data = (np.zeros((0, 0), dtype=np.float32), [], [])
+
+    def __len__(self):
+        return len(self._data[2])
+
+    def _fingerprint(self, ids: List[str]) -> str:
+        model = getattr(self.embedding, "model", type(self.embedding).__name__)
+        payload = "\n".join([str(model), *ids])
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+    def build(self, docs_by_id: dict) -> bool:
+        """Switch to the files for ``docs_by_id``, writing them if no worker has.
+
+        Rows for IDs already mapped are reused; only new documents are
+        embedded. Returns True if this process wrote the files.
+        """
+        ids = sorted(docs_by_id)
+        base = self.directory / f"{self.name}-{self._fingerprint(ids)}"
+        vectors_path, meta_path = base.with_suffix(".npy"), base.with_suffix(".json")
+
+        built = False
+        with file_lock(self.directory / f"{self.name}.lock"):
+            # The metadata file is written last, so it marks a complete build
+            if not meta_path.exists() or not vectors_path.exists():
+                matrix = self._embed(ids, docs_by_id)
+                _write_atomic(vectors_path, lambda f: np.save(f, matrix))
+                meta = {
+                    "ids": ids,
+                    "docs": [
+                        {
+                            "page_content": docs_by_id[i].page_content,
+                            "metadata": docs_by_id[i].metadata,
+                        }
+                        for i in ids
+                    ],
+                }
+                _write_atomic(
+                    meta_path,
+                    lambda f: f.write(
+                        json.dumps(meta, ensure_ascii=False, default=str).encode()
+                    ),
+                )
+                self._remove_stale(base)
+                built = True
+            self._open(vectors_path, meta_path)
+        return built
+
+    def _embed(self, ids: List[str], docs_by_id: dict) -> np.ndarray:
+        matrix, _, current_ids = self._data
+        rows = {doc_id: row for row, doc_id in enumerate(current_ids)}
+        missing = [i for i in ids if i not in rows]
+        fresh = {}
+        if missing:
+            vectors = self.embedding.embed_documents(
+                [docs_by_id[i].page_content for i in missing]
+            )
+            fresh = dict(zip(missing, normalize_rows(vectors)))
+
+        dim = matrix.shape[1] if len(current_ids) else None
+        if dim is None and fresh:
+            dim = len(next(iter(fresh.values())))
+        out = np.zeros((len(ids), dim or 0), dtype=np.float32)
+        for row, doc_id in enumerate(ids):
+            out[row] = fresh[doc_id] if doc_id in fresh else matrix[rows[doc_id]]
+        return out
+
+    def _open(self, vectors_path: Path, meta_path: Path):
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        # An empty .npy cannot be memory-mapped; there is nothing to share anyway
+        matrix = np.load(vectors_path, mmap_mode="r" if meta["ids"] else None)
+        docs = [Document(**d) for d in meta["docs"]]
+        self._data = (matrix, docs, meta["ids"])
+        self.path = vectors_path
+
+    def _remove_stale(self, keep: Path):
+        # Processes that still map an old file keep their view of it (POSIX);
+        # where the OS refuses, the file is left for the next build to retry
+        for old in self.directory.glob(f"{self.name}-*"):
+            if old.stem != keep.name and old.suffix in (".npy", ".json"):
+                with contextlib.suppress(OSError):
+                    old.unlink()
+
+    def search_with_scores(self, vector, k: int = 4, filter: dict = None):
+        matrix, docs, _ = self._data
+        if not docs:
+            return []
+        query = normalize_rows(vector)[0]
+        if not filter:
+            scores = block_scores(matrix, None, query)
+            return [(docs[i], float(scores[i])) for i in top_k(scores, k)]
+
+        candidates = self._filter_rows(docs, filter)
+        scores = block_scores(matrix[candidates], None, query)
+        return [(docs[candidates[i]], float(scores[i])) for i in top_k(scores, k)]
+
+    def add_texts(
+        self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs
+    ):
+        raise NotImplementedError("MmapVectorStore is read-only; use build()")
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("Build a MmapVectorStore with build()")
+
+
+class NumpyVectorStore(_MatrixSearch):
+    """In-process vector store: unit vectors in one contiguous NumPy array.
+
+    Vectors are stored as float32, float16 (half the memory) or int8 with a
+    per-vector scale (a quarter). A search is one blocked matrix-vector
+    product and an ``argpartition``, i.e. exact top-k over the stored vectors,
+    without Chroma's client, SQLite and HNSW overhead. From ``ann_threshold``
+    vectors on, searches probe an :class:`IVFIndex` instead (approximate).
+    """
+
+    def __init__(
+        self,
+        embedding,
+        dtype: str = VECTOR_DTYPE,
+        ann_threshold: int = VECTOR_ANN_THRESHOLD,
+        nprobe: int = VECTOR_ANN_NPROBE,
+    ):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown vector dtype: {dtype!r}")
+        self.embedding = embedding
+        self.dtype = dtype
+        self.ann_threshold = ann_threshold
+        self.nprobe = nprobe
+        self._lock = threading.Lock()
+        # (rows, scales, documents, ids, ivf) swapped in one assignment
+        self._data = (np.zeros((0, 0), dtype=dtype), None, [], [], None)
+
+    def __len__(self):
+        return len(self._data[3])
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by vectors, scales and the IVF index (not documents)."""
+        rows, scales, _, _, ivf = self._data
+        return (
+            rows.nbytes
+            + (scales.nbytes if scales is not None else 0)
+            + (ivf.nbytes if ivf is not None else 0)
+        )
+
+    def _swap(self, rows, scales, docs, ids):
+        use_ivf = self.ann_threshold and len(ids) >= self.ann_threshold
+        ivf = IVFIndex(rows, scales) if use_ivf else None
+        self._data = (rows, scales, docs, ids, ivf)
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs,
+    ) -> List[str]:
+        """Embed and add ``texts``; an existing ID is replaced."""
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = (
+            list(ids) if ids else [hashlib.sha1(t.encode()).hexdigest() for t in texts]
+        )
+        # In batches, so a large corpus never exists as float32 all at once
+        parts = [
+            quantize(
+                normalize_rows(
+                    self.embedding.embed_documents(texts[start : start + EMBED_BATCH])
+                ),
+                self.dtype,
+            )
+            for start in range(0, len(texts), EMBED_BATCH)
+        ]
+        new_rows = np.concatenate([rows for rows, _ in parts])
+        new_scales = (
+            np.concatenate([scales for _, scales in parts])
+            if self.dtype == "int8"
+            else None
+        )
+        new_docs = [
+            Document(page_content=t, metadata=m or {}, id=i)
+            for t, m, i in zip(texts, metadatas, ids)
+        ]
+
+        with self._lock:
+            rows, scales, docs, current_ids = self._without(set(ids))
+            if current_ids:
+                rows = np.concatenate([rows, new_rows])
+                if scales is not None:
+                    scales = np.concatenate([scales, new_scales])
+            else:
+                rows, scales = new_rows, new_scales
+            self._swap(rows, scales, docs + new_docs, current_ids + ids)
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs) -> bool:
+        if not ids:
+            return False
+        with self._lock:
+            remaining = self._without(set(ids))
+            if len(remaining[3]) == len(self):
+                return False
+            self._swap(*remaining)
+        return True
+
+    def _without(self, removed: set):
+        """Current (rows, scales, documents, ids) minus the IDs in ``removed``."""
+        rows, scales, docs, ids, _ = self._data
+        keep = [n for n, doc_id in enumerate(ids) if doc_id not in removed]
+        if len(keep) == len(ids):
+            return rows, scales, docs, ids
+        return (
+            rows[keep],
+            scales[keep] if scales is not None else None,
+            [docs[n] for n in keep],
+            [ids[n] for n in keep],
+        )
+
+    def search_with_scores(self, vector, k: int = 4, filter: dict = None):
+        rows, scales, docs, _, ivf = self._data
+        if not docs:
+            return []
+        query = normalize_rows(vector)[0]
+        if ivf is None and not filter:
+            scores = block_scores(rows, scales, query)
+            return [(docs[i], float(scores[i])) for i in top_k(scores, k)]
+
+        # A filtered search scores exactly the rows that pass it; probing IVF
+        # lists first could leave fewer than k of them
+        if filter:
+            candidates = self._filter_rows(docs, filter)
+        else:
+            candidates = ivf.candidates(query, self.nprobe)
+        scores = block_scores(
+            rows[candidates], scales[candidates] if scales is not None else None, query
+        )
+        return [(docs[candidates[i]], float(scores[i])) for i in top_k(scores, k)]